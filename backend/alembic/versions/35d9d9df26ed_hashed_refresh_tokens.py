@@ -0,0 +1,102 @@
+"""hashed refresh tokens
+
+Revision ID: 35d9d9df26ed
+Revises: 6124985a7ca7
+Create Date: 2026-10-17 10:02:57.046113
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "35d9d9df26ed"
+down_revision: Union[str, None] = "6124985a7ca7"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+BACKFILL_BATCH_SIZE = 5000
+
+
+def upgrade() -> None:
+    op.add_column(
+        "user_refresh_tokens", sa.Column("token_hash", sa.LargeBinary(32))
+    )
+
+    with op.get_context().autocommit_block():
+        # Short batches, each committed on its own, instead of one UPDATE
+        # that rewrites and locks the whole table
+        connection = op.get_bind()
+        while True:
+            result = connection.execute(
+                sa.text(
+                    "UPDATE user_refresh_tokens "
+                    "SET token_hash = sha256(convert_to(token, 'UTF8')) "
+                    "WHERE id IN (SELECT id FROM user_refresh_tokens "
+                    "WHERE token_hash IS NULL LIMIT :batch_size)"
+                ),
+                {"batch_size": BACKFILL_BATCH_SIZE},
+            )
+            if result.rowcount == 0:
+                break
+
+        # SET NOT NULL alone scans the table under ACCESS EXCLUSIVE. With a
+        # validated CHECK in place it skips the scan, and VALIDATE only
+        # takes a lock that lets writes through.
+        op.execute(
+            "ALTER TABLE user_refresh_tokens "
+            "ADD CONSTRAINT ck_user_refresh_tokens_token_hash_not_null "
+            "CHECK (token_hash IS NOT NULL) NOT VALID"
+        )
+        op.execute(
+            "ALTER TABLE user_refresh_tokens "
+            "VALIDATE CONSTRAINT ck_user_refresh_tokens_token_hash_not_null"
+        )
+        op.alter_column("user_refresh_tokens", "token_hash", nullable=False)
+        op.drop_constraint(
+            "ck_user_refresh_tokens_token_hash_not_null",
+            "user_refresh_tokens",
+            type_="check",
+        )
+
+        # Build the new index and drop the old ones without blocking writes
+        op.create_index(
+            "ix_user_refresh_tokens_user_token",
+            "user_refresh_tokens",
+            ["user_id", "token_hash"],
+            unique=True,
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+        op.drop_index(
+            "ix_user_refresh_tokens_token",
+            "user_refresh_tokens",
+            postgresql_concurrently=True,
+            if_exists=True,
+        )
+        # Duplicates the primary key
+        op.drop_index(
+            "ix_user_refresh_tokens_id",
+            "user_refresh_tokens",
+            postgresql_concurrently=True,
+            if_exists=True,
+        )
+
+    op.drop_column("user_refresh_tokens", "token")
+
+
+def downgrade() -> None:
+    # Only digests are stored, so existing sessions cannot be kept
+    op.execute("DELETE FROM user_refresh_tokens")
+    op.add_column(
+        "user_refresh_tokens", sa.Column("token", sa.String(), nullable=False)
+    )
+    op.create_index(
+        "ix_user_refresh_tokens_token", "user_refresh_tokens", ["token"], unique=True
+    )
+    op.create_index("ix_user_refresh_tokens_id", "user_refresh_tokens", ["id"])
+    op.drop_index("ix_user_refresh_tokens_user_token", "user_refresh_tokens")
+    op.drop_column("user_refresh_tokens", "token_hash")
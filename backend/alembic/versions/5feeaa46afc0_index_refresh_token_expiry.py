@@ -0,0 +1,39 @@
+"""index refresh token expiry
+
+Revision ID: 5feeaa46afc0
+Revises: 35d9d9df26ed
+Create Date: 2026-10-17 10:48:19.722410
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "5feeaa46afc0"
+down_revision: Union[str, None] = "35d9d9df26ed"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_user_refresh_tokens_expires_at",
+            "user_refresh_tokens",
+            ["expires_at"],
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            "ix_user_refresh_tokens_expires_at",
+            "user_refresh_tokens",
+            postgresql_concurrently=True,
+            if_exists=True,
+        )
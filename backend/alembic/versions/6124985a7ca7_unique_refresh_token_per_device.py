@@ -0,0 +1,42 @@
+"""unique refresh token per device
+
+Revision ID: 6124985a7ca7
+Revises: dc31755415fa
+Create Date: 2026-10-17 09:20:03.518870
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "6124985a7ca7"
+down_revision: Union[str, None] = "dc31755415fa"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Keep only the newest token per (user, device) so the index can be built
+    op.execute(
+        """
+        DELETE FROM user_refresh_tokens t
+        USING user_refresh_tokens newer
+        WHERE t.user_id = newer.user_id
+          AND t.device_info IS NOT DISTINCT FROM newer.device_info
+          AND t.id < newer.id
+        """
+    )
+    op.create_index(
+        "ix_user_refresh_tokens_user_device",
+        "user_refresh_tokens",
+        ["user_id", "device_info"],
+        unique=True,
+        postgresql_nulls_not_distinct=True,
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_user_refresh_tokens_user_device", "user_refresh_tokens")
@@ -0,0 +1,42 @@
+"""revoked tokens
+
+Revision ID: 8cb299e9c11a
+Revises: de8952e06f87
+Create Date: 2026-10-17 15:36:08.519372
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "8cb299e9c11a"
+down_revision: Union[str, None] = "de8952e06f87"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "revoked_tokens",
+        sa.Column("id", sa.BigInteger(), nullable=False),
+        sa.Column("jti", sa.Text(), nullable=True),
+        sa.Column("subject", sa.Text(), nullable=True),
+        sa.Column("revoked_at", sa.DateTime(timezone=True), nullable=False),
+        sa.Column("expires_at", sa.DateTime(timezone=True), nullable=False),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index(
+        "ix_revoked_tokens_revoked_at", "revoked_tokens", ["revoked_at"]
+    )
+    op.create_index(
+        "ix_revoked_tokens_expires_at", "revoked_tokens", ["expires_at"]
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_revoked_tokens_expires_at", "revoked_tokens")
+    op.drop_index("ix_revoked_tokens_revoked_at", "revoked_tokens")
+    op.drop_table("revoked_tokens")
@@ -0,0 +1,115 @@
+"""baseline schema
+
+Revision ID: dc31755415fa
+Revises: 
+Create Date: 2026-10-17 09:12:41.381204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "dc31755415fa"
+down_revision: Union[str, None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Databases created by init_db() already have these tables
+    existing = set(sa.inspect(op.get_bind()).get_table_names())
+
+    if "users" not in existing:
+        op.create_table(
+            "users",
+            sa.Column("id", sa.Integer(), nullable=False),
+            sa.Column("email", sa.Text(), nullable=False),
+            sa.Column("name", sa.Text(), nullable=False),
+            sa.Column("password_hash", sa.Text(), nullable=True),
+            sa.Column("timezone", sa.Text(), nullable=False),
+            sa.Column("created_at", sa.DateTime(), nullable=False),
+            sa.Column("last_login", sa.DateTime(), nullable=False),
+            sa.Column("last_active", sa.Date(), nullable=False),
+            sa.Column("has_access", sa.Boolean(), nullable=False),
+            sa.PrimaryKeyConstraint("id"),
+            sa.UniqueConstraint("email"),
+        )
+        op.create_index("ix_users_id", "users", ["id"])
+
+    if "user_refresh_tokens" not in existing:
+        op.create_table(
+            "user_refresh_tokens",
+            sa.Column("id", sa.Integer(), nullable=False),
+            sa.Column("user_id", sa.Integer(), nullable=False),
+            sa.Column("token", sa.String(), nullable=False),
+            sa.Column("device_info", sa.String(), nullable=True),
+            sa.Column("issued_at", sa.DateTime(timezone=True), nullable=True),
+            sa.Column("expires_at", sa.DateTime(timezone=True), nullable=False),
+            sa.ForeignKeyConstraint(["user_id"], ["users.id"], ondelete="CASCADE"),
+            sa.PrimaryKeyConstraint("id"),
+        )
+        op.create_index("ix_user_refresh_tokens_id", "user_refresh_tokens", ["id"])
+        op.create_index(
+            "ix_user_refresh_tokens_token",
+            "user_refresh_tokens",
+            ["token"],
+            unique=True,
+        )
+
+    if "rate_limit_counters" not in existing:
+        op.create_table(
+            "rate_limit_counters",
+            sa.Column("key", sa.Text(), nullable=False),
+            sa.Column("window_index", sa.BigInteger(), nullable=False),
+            sa.Column("count", sa.Integer(), nullable=False),
+            sa.Column("expires_at", sa.DateTime(timezone=True), nullable=False),
+            sa.PrimaryKeyConstraint("key", "window_index"),
+            prefixes=["UNLOGGED"],
+        )
+        op.create_index(
+            "ix_rate_limit_counters_expires_at", "rate_limit_counters", ["expires_at"]
+        )
+
+    if "email_outbox" not in existing:
+        op.create_table(
+            "email_outbox",
+            sa.Column("id", sa.Integer(), nullable=False),
+            sa.Column("recipient", sa.Text(), nullable=False),
+            sa.Column("subject", sa.Text(), nullable=False),
+            sa.Column("text_body", sa.Text(), nullable=False),
+            sa.Column("html_body", sa.Text(), nullable=True),
+            sa.Column("attempts", sa.Integer(), nullable=False),
+            sa.Column("last_error", sa.Text(), nullable=True),
+            sa.Column(
+                "created_at",
+                sa.DateTime(timezone=True),
+                server_default=sa.func.now(),
+                nullable=False,
+            ),
+            sa.Column(
+                "next_attempt_at",
+                sa.DateTime(timezone=True),
+                server_default=sa.func.now(),
+                nullable=False,
+            ),
+            sa.Column("sent_at", sa.DateTime(timezone=True), nullable=True),
+            sa.Column("failed_at", sa.DateTime(timezone=True), nullable=True),
+            sa.PrimaryKeyConstraint("id"),
+        )
+        op.create_index("ix_email_outbox_id", "email_outbox", ["id"])
+        op.create_index(
+            "ix_email_outbox_pending",
+            "email_outbox",
+            ["next_attempt_at"],
+            postgresql_where=sa.text("sent_at IS NULL AND failed_at IS NULL"),
+        )
+
+
+def downgrade() -> None:
+    op.drop_table("email_outbox")
+    op.drop_table("rate_limit_counters")
+    op.drop_table("user_refresh_tokens")
+    op.drop_table("users")
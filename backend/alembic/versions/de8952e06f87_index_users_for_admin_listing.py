@@ -0,0 +1,53 @@
+"""index users for admin listing
+
+Revision ID: de8952e06f87
+Revises: 5feeaa46afc0
+Create Date: 2026-10-17 13:12:41.208135
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "de8952e06f87"
+down_revision: Union[str, None] = "5feeaa46afc0"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+INDEXES = [
+    ("ix_users_created_at_id", ["created_at", "id"], {}),
+    ("ix_users_has_access_created_at_id", ["has_access", "created_at", "id"], {}),
+    ("ix_users_last_active", ["last_active"], {}),
+    (
+        "ix_users_email_pattern",
+        ["email"],
+        {"postgresql_ops": {"email": "text_pattern_ops"}},
+    ),
+]
+
+
+def upgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name, columns, options in INDEXES:
+            op.create_index(
+                name,
+                "users",
+                columns,
+                postgresql_concurrently=True,
+                if_not_exists=True,
+                **options,
+            )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name, _, _ in reversed(INDEXES):
+            op.drop_index(
+                name,
+                "users",
+                postgresql_concurrently=True,
+                if_exists=True,
+            )
@@ -0,0 +1,112 @@
+import asyncio
+import contextlib
+import logging
+from datetime import date, datetime
+
+from app import config
+from app.core.users import invalidate_cached_user
+from app.database.engine import AsyncSessionLocal
+from app.database.schema.users import User
+from sqlalchemy import Date, DateTime, Integer, column, func, update, values
+
+logger = logging.getLogger(__name__)
+
+
+# Buffers last_active and last_login per worker and writes them in one bulk
+# UPDATE, so the request path never writes these columns itself
+class ActivityRecorder:
+    def __init__(self, flush_interval: float):
+        self.flush_interval = flush_interval
+        # user id -> (email, last_active, last_login), newest values only
+        self._pending: dict[int, tuple[str, date | None, datetime | None]] = {}
+        self._task: asyncio.Task | None = None
+        self.flushed = 0
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    def _record(
+        self,
+        user: User,
+        last_active: date | None = None,
+        last_login: datetime | None = None,
+    ):
+        _, pending_active, pending_login = self._pending.get(user.id, (None,) * 3)
+        if pending_active and (not last_active or pending_active > last_active):
+            last_active = pending_active
+        if pending_login and (not last_login or pending_login > last_login):
+            last_login = pending_login
+        self._pending[user.id] = (user.email, last_active, last_login)
+
+    def record_active(self, user: User, at: datetime):
+        self._record(user, last_active=at.date())
+
+    def record_login(self, user: User, at: datetime):
+        self._record(user, last_active=at.date(), last_login=at)
+
+    async def flush(self) -> int:
+        if not self._pending:
+            return 0
+        pending, self._pending = self._pending, {}
+
+        rows = values(
+            column("id", Integer),
+            column("last_active", Date),
+            column("last_login", DateTime),
+            name="activity",
+        ).data(
+            [
+                (user_id, last_active, last_login)
+                for user_id, (_, last_active, last_login) in pending.items()
+            ]
+        )
+        # GREATEST skips NULLs and never moves a timestamp backwards
+        statement = (
+            update(User)
+            .where(User.id == rows.c.id)
+            .values(
+                last_active=func.greatest(User.last_active, rows.c.last_active),
+                last_login=func.greatest(User.last_login, rows.c.last_login),
+            )
+            .execution_options(synchronize_session=False)
+        )
+        try:
+            async with AsyncSessionLocal() as session, session.begin():
+                await session.execute(statement)
+        except BaseException:
+            # Put the values back unless newer ones arrived meanwhile, also
+            # when the flush is cancelled at shutdown
+            for user_id, (email, last_active, last_login) in pending.items():
+                user = User(id=user_id, email=email)
+                self._record(user, last_active, last_login)
+            raise
+
+        for email, _, _ in pending.values():
+            invalidate_cached_user(email)
+        self.flushed += len(pending)
+        return len(pending)
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error(f"Failed to flush user activity: {str(e)}")
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            # A flush interrupted here puts its values back before the final
+            # flush picks them up
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._task
+            self._task = None
+        await self.flush()
+
+
+activity_recorder = ActivityRecorder(flush_interval=config.ACTIVITY_FLUSH_SECONDS)
@@ -0,0 +1,60 @@
+import time
+
+from app import config, profiler
+from app.metrics import RequestStats, current_request, metrics
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+
+# Plain ASGI rather than BaseHTTPMiddleware, which would wrap every response
+# in an extra task and stream
+class MetricsMiddleware:
+    def __init__(self, app: ASGIApp, record: bool = True, profile: bool = False):
+        self.app = app
+        self.record = record
+        self.profile = profile
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats(profile=self.profile)
+        token = current_request.set(stats)
+        status = 500
+        started = time.perf_counter()
+
+        async def send_wrapper(message: Message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                if self.profile:
+                    # Headers go out before the body, so total stops here
+                    headers = MutableHeaders(scope=message)
+                    headers.append(
+                        "Server-Timing",
+                        profiler.server_timing(stats, time.perf_counter() - started),
+                    )
+                    # Lets the frontend read the timings through the Performance API
+                    headers.append("Timing-Allow-Origin", ", ".join(config.ORIGINS))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - started
+            current_request.reset(token)
+            if self.record:
+                self._record(scope, status, stats, elapsed)
+            if self.profile:
+                profiler.report(scope["method"], scope["path"], stats, elapsed)
+
+    def _record(self, scope: Scope, status: int, stats: RequestStats, elapsed: float):
+        # The route template keeps label cardinality bounded, unlike the path
+        route = scope.get("route")
+        labels = (scope["method"], route.path if route is not None else "unmatched")
+        metrics.inc("http_requests_total", (*labels, str(status)))
+        metrics.observe("http_request_duration_seconds", labels, elapsed)
+        metrics.inc("http_request_db_queries_total", labels, stats.db_queries)
+        metrics.inc("http_request_db_seconds_total", labels, stats.db_seconds)
+        metrics.inc("http_request_auth_seconds_total", labels, stats.auth_seconds)
@@ -1,4 +1,4 @@
-from datetime import datetime
+from datetime import date, datetime
 from typing import Optional
 
 from pydantic import BaseModel, EmailStr
@@ -17,6 +17,23 @@ class UserInDB(BaseModel):
     has_access: bool
 
 
+class AdminUser(BaseModel):
+    id: int
+    email: EmailStr
+    name: Optional[str] = ""
+    timezone: str
+    created_at: datetime
+    last_login: datetime
+    last_active: date
+    has_access: bool
+
+
+class UserPage(BaseModel):
+    users: list[AdminUser]
+    # Pass back as `cursor` for the next page, null on the last one
+    next_cursor: Optional[str] = None
+
+
 class SignupRequest(BaseModel):
     email: EmailStr
     name: str = ""
@@ -0,0 +1,203 @@
+import asyncio
+import fcntl
+import hashlib
+import logging
+import os
+import struct
+import tempfile
+import time
+from abc import ABC, abstractmethod
+from datetime import datetime, timezone
+from multiprocessing import resource_tracker, shared_memory
+
+from app.api.sliding_window import SlidingWindowStore, window_overlap
+from app.database.engine import engine
+from app.database.schema.rate_limits import RateLimitCounter
+from sqlalchemy import and_, delete, select
+from sqlalchemy.dialects.postgresql import insert
+
+logger = logging.getLogger(__name__)
+
+
+class RateLimitBackend(ABC):
+    # Records a request for key, returns False when it is over the limit
+    @abstractmethod
+    async def hit(self, key: str, limit: int, window: float) -> bool: ...
+
+    # Drop expired state, returns the number of keys removed
+    async def sweep(self) -> int:
+        return 0
+
+    async def close(self):
+        pass
+
+
+# Per worker process, so the effective limit is multiplied by the worker count
+class MemoryRateLimitBackend(RateLimitBackend):
+    def __init__(self, max_keys: int):
+        self.store = SlidingWindowStore(max_keys=max_keys)
+
+    async def hit(self, key: str, limit: int, window: float) -> bool:
+        return self.store.hit(key, limit, window, time.time())
+
+    async def sweep(self) -> int:
+        return self.store.sweep(time.time())
+
+
+class _FileLock:
+    def __init__(self, file, retry_interval: float = 0.001):
+        self.file = file
+        self.retry_interval = retry_interval
+
+    def acquire(self, blocking: bool = True) -> bool:
+        flags = fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB
+        try:
+            fcntl.flock(self.file, flags)
+        except BlockingIOError:
+            return False
+        return True
+
+    # Polls instead of blocking, so a worker waiting on another one keeps
+    # serving its other requests
+    async def acquire_async(self):
+        while not self.acquire(blocking=False):
+            await asyncio.sleep(self.retry_interval)
+
+    def release(self):
+        fcntl.flock(self.file, fcntl.LOCK_UN)
+
+    def __enter__(self):
+        self.acquire()
+
+    def __exit__(self, *exc):
+        self.release()
+
+
+# key hash, window index, previous count, current count, expires at
+_SLOT = struct.Struct("<QqIId")
+_BUCKET_SIZE = 4
+
+
+# Shared by every worker on the host through a fixed-size table in shared
+# memory. Keys hash to a bucket of a few slots; when a bucket is full the slot
+# that expires first is reused, which bounds memory like the LRU cap does.
+class SharedMemoryRateLimitBackend(RateLimitBackend):
+    def __init__(self, name: str, slots: int):
+        lock_path = os.path.join(tempfile.gettempdir(), f"{name}.lock")
+        self._lock_file = open(lock_path, "a+b")
+        self._lock = _FileLock(self._lock_file)
+        with self._lock:
+            try:
+                self._shm = shared_memory.SharedMemory(
+                    name=name, create=True, size=slots * _SLOT.size
+                )
+            except FileExistsError:
+                self._shm = shared_memory.SharedMemory(name=name)
+        # The segment outlives any single worker, so keep the resource tracker
+        # from unlinking it when this process exits. It registered the POSIX
+        # name, which has a leading slash that .name strips.
+        resource_tracker.unregister(f"/{self._shm.name}", "shared_memory")
+        self.buckets = self._shm.size // _SLOT.size // _BUCKET_SIZE
+
+    # Called with the lock held
+    def _hit(self, key: str, limit: int, window: float, now: float) -> bool:
+        digest = hashlib.blake2b(key.encode(), digest_size=8).digest()
+        key_hash = int.from_bytes(digest, "little") or 1
+        index = int(now // window)
+        first = (key_hash % self.buckets) * _BUCKET_SIZE
+        buf = self._shm.buf
+
+        slot = None
+        victim, victim_expires_at = first, float("inf")
+        for i in range(first, first + _BUCKET_SIZE):
+            stored_hash, stored_index, previous, current, expires_at = (
+                _SLOT.unpack_from(buf, i * _SLOT.size)
+            )
+            if stored_hash == key_hash:
+                slot = i
+                break
+            if expires_at < victim_expires_at:
+                victim, victim_expires_at = i, expires_at
+
+        if slot is None:
+            slot = victim
+            stored_index, previous, current = index, 0, 0
+        if stored_index != index:
+            previous = current if stored_index == index - 1 else 0
+            current = 0
+
+        allowed = previous * window_overlap(now, index, window) + current < limit
+        if allowed:
+            current += 1
+        _SLOT.pack_into(
+            buf,
+            slot * _SLOT.size,
+            key_hash,
+            index,
+            previous,
+            current,
+            (index + 2) * window,
+        )
+        return allowed
+
+    async def hit(self, key: str, limit: int, window: float) -> bool:
+        await self._lock.acquire_async()
+        try:
+            # A handful of struct reads, nothing here awaits
+            return self._hit(key, limit, window, time.time())
+        finally:
+            self._lock.release()
+
+    async def close(self):
+        self._shm.close()
+        self._lock_file.close()
+
+
+# Shared by every node through an UNLOGGED table. Each check is a single
+# upsert; rejected requests are counted too, so a client that keeps hammering
+# stays limited. Expired windows are deleted in bulk by sweep().
+class PostgresRateLimitBackend(RateLimitBackend):
+    async def hit(self, key: str, limit: int, window: float) -> bool:
+        now = time.time()
+        index = int(now // window)
+        previous_window = (
+            select(RateLimitCounter.count)
+            .where(
+                and_(
+                    RateLimitCounter.key == key,
+                    RateLimitCounter.window_index == index - 1,
+                )
+            )
+            .scalar_subquery()
+        )
+        statement = (
+            insert(RateLimitCounter)
+            .values(
+                key=key,
+                window_index=index,
+                count=1,
+                expires_at=datetime.fromtimestamp(
+                    (index + 2) * window, tz=timezone.utc
+                ),
+            )
+            .on_conflict_do_update(
+                index_elements=[RateLimitCounter.key, RateLimitCounter.window_index],
+                set_={"count": RateLimitCounter.count + 1},
+            )
+            .returning(RateLimitCounter.count, previous_window)
+        )
+        async with engine.begin() as conn:
+            current, previous = (await conn.execute(statement)).one()
+
+        # current already includes this request
+        estimate = (previous or 0) * window_overlap(now, index, window) + current - 1
+        return estimate < limit
+
+    async def sweep(self) -> int:
+        async with engine.begin() as conn:
+            result = await conn.execute(
+                delete(RateLimitCounter).where(
+                    RateLimitCounter.expires_at < datetime.now(timezone.utc)
+                )
+            )
+        return result.rowcount
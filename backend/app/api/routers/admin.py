@@ -0,0 +1,96 @@
+from datetime import date, datetime
+from typing import Literal, Union
+
+from app import config
+from app.api.models.users import UserPage
+from app.api.serializers import admin_user_serializer, user_page_serializer
+from app.auth import get_admin_user
+from app.core.admin import list_users
+from app.core.export import (
+    MEDIA_TYPES,
+    build_export_query,
+    parse_columns,
+    stream_export,
+)
+from app.database.engine import ReplicaReadSessionLocal, get_read_db
+from app.exceptions import BadRequestException
+from fastapi import APIRouter, Depends, Query
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+
+router = APIRouter(prefix="/admin", dependencies=[Depends(get_admin_user)])
+
+
+@router.get("/users", response_model=UserPage)
+async def get_users(
+    limit: int = Query(config.ADMIN_PAGE_SIZE, ge=1, le=config.ADMIN_MAX_PAGE_SIZE),
+    cursor: Union[str, None] = Query(
+        None, description="next_cursor of the previous page"
+    ),
+    has_access: Union[bool, None] = None,
+    active_after: Union[date, None] = None,
+    active_before: Union[date, None] = None,
+    email_prefix: Union[str, None] = None,
+    db: AsyncSession = Depends(get_read_db),
+):
+    try:
+        users, next_cursor = await list_users(
+            db,
+            limit,
+            cursor,
+            has_access=has_access,
+            active_after=active_after,
+            active_before=active_before,
+            email_prefix=email_prefix,
+        )
+    except ValueError as e:
+        raise BadRequestException(str(e))
+    page = UserPage.model_construct(
+        users=[admin_user_serializer.construct(user) for user in users],
+        next_cursor=next_cursor,
+    )
+    return user_page_serializer.response(page)
+
+
+@router.get("/users/export", response_class=StreamingResponse)
+async def export_users(
+    format: Literal["ndjson", "csv"] = "ndjson",
+    columns: Union[str, None] = Query(
+        None, description="Comma separated columns, all of them when omitted"
+    ),
+    has_access: Union[bool, None] = None,
+    created_after: Union[datetime, None] = None,
+    created_before: Union[datetime, None] = None,
+    active_after: Union[date, None] = None,
+    active_before: Union[date, None] = None,
+):
+    try:
+        selected = parse_columns(columns)
+    except ValueError as e:
+        raise BadRequestException(str(e))
+    query = build_export_query(
+        selected,
+        has_access=has_access,
+        created_after=created_after,
+        created_before=created_before,
+        active_after=active_after,
+        active_before=active_before,
+    )
+
+    # The session lives as long as the response body, not the request
+    # handler, so it is opened here instead of through get_read_db
+    async def body():
+        async with ReplicaReadSessionLocal() as db:
+            async for chunk in stream_export(
+                db, format, selected, query, config.EXPORT_BATCH_SIZE
+            ):
+                yield chunk
+
+    timestamp = datetime.utcnow().strftime("%Y%m%dT%H%M%S")
+    return StreamingResponse(
+        body(),
+        media_type=MEDIA_TYPES[format],
+        headers={
+            "Content-Disposition": f'attachment; filename="users-{timestamp}.{format}"'
+        },
+    )
@@ -0,0 +1,31 @@
+from app.database.engine import (
+    engine,
+    pool_metrics,
+    replica_engine,
+    replica_pool_metrics,
+)
+from app.database.health import DatabaseHealth
+from fastapi import APIRouter, Response
+
+router = APIRouter()
+
+primary_health = DatabaseHealth(engine)
+replica_health = DatabaseHealth(replica_engine) if replica_engine is not None else None
+
+
+@router.get("/health")
+async def health(response: Response):
+    databases = {"primary": await primary_health.check()}
+    pools = {"primary": pool_metrics.stats()}
+    if replica_health is not None:
+        databases["replica"] = await replica_health.check()
+        pools["replica"] = replica_pool_metrics.stats()
+
+    ready = all(database["ok"] for database in databases.values())
+    if not ready:
+        response.status_code = 503
+    return {
+        "status": "ok" if ready else "unavailable",
+        "databases": databases,
+        "pools": pools,
+    }
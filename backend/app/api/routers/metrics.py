@@ -0,0 +1,17 @@
+from app import config
+from app.exceptions import NotFoundException
+from app.metrics import metrics
+from fastapi import APIRouter, Request
+from fastapi.responses import PlainTextResponse
+
+router = APIRouter()
+
+
+@router.get("/metrics", response_class=PlainTextResponse)
+async def prometheus_metrics(request: Request):
+    allowed = config.METRICS_ALLOWED_CLIENTS
+    if allowed and request.client.host not in allowed:
+        raise NotFoundException("Not found")
+    return PlainTextResponse(
+        await metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8"
+    )
@@ -11,7 +11,8 @@ from app.api.models.users import (
     Token,
     UserInDB,
 )
-from app.api.security import rate_limiter
+from app.api.security import RateLimiter
+from app.api.serializers import login_serializer, token_serializer, user_serializer
 from app.auth import (
     ACCESS_TOKEN_EXPIRE_MINUTES,
     auth_login,
@@ -19,15 +20,20 @@ from app.auth import (
     create_access_token,
     decode_access_token,
     get_current_user,
+    get_current_user_readonly,
     get_password_hash,
+    hash_refresh_token,
     login_with_google,
+    oauth2_scheme,
+    revoke_access_token,
+    revoke_user_tokens,
 )
-from app.core.users import fetch_user_by_email
-from app.database.engine import get_db
+from app.core.users import fetch_user_by_email, invalidate_cached_user
+from app.database.engine import get_db, get_read_db
 from app.database.schema.tokens import RefreshToken
 from app.database.schema.users import User
-from app.email import send_welcome_email
-from app.exceptions import BadRequestException, NotFoundException, UnauthorizedException
+from app.email import enqueue_welcome_email
+from app.exceptions import BadRequestException, UnauthorizedException
 from fastapi import (
     APIRouter,
     Cookie,
@@ -37,32 +43,40 @@ from fastapi import (
     Response,
 )
 from jose import JWTError
-from sqlalchemy import select
+from sqlalchemy import delete, select
+from sqlalchemy.dialects.postgresql import insert
 from sqlalchemy.ext.asyncio import AsyncSession
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/users")
 
+signup_rate_limiter = RateLimiter("signup")
+login_rate_limiter = RateLimiter("login")
+google_login_rate_limiter = RateLimiter("google_login")
+refresh_rate_limiter = RateLimiter("refresh")
+
 
 @router.get("/whoami", response_model=UserInDB)
 @router.get("/whoami/", response_model=UserInDB, include_in_schema=False)
-async def get_users_me(current_user: User = Depends(get_current_user)):
-    return current_user
+async def get_users_me(current_user: User = Depends(get_current_user_readonly)):
+    return user_serializer.response(current_user)
 
 
 @router.post(
     "/signup",
     response_model=UserInDB,
-    dependencies=[Depends(rate_limiter)],
+    dependencies=[Depends(signup_rate_limiter)],
 )
 @router.post(
     "/signup/",
     response_model=UserInDB,
     include_in_schema=False,
+    dependencies=[Depends(signup_rate_limiter)],
 )
 async def post_signup(
     signup_request: SignupRequest,
+    response: Response,
     db: AsyncSession = Depends(get_db),
     x_timezone: str = Header(..., description="User's timezone"),
 ):
@@ -70,35 +84,44 @@ async def post_signup(
     name = signup_request.name.strip()
     password = signup_request.password.strip()
 
-    user = await fetch_user_by_email(email, db)
-    if user:
+    # Index probe first, so a taken email never costs a bcrypt hash
+    if await db.scalar(select(User.id).where(User.email == email)) is not None:
         raise BadRequestException("Email already registered")
 
-    new_user = User(
-        email=email,
-        name=name,
-        password_hash=get_password_hash(password),
-        timezone=x_timezone,
-        last_login=datetime.utcnow(),
+    # Returns nothing if the email was taken since the probe, which closes
+    # the race between two signups
+    result = await db.execute(
+        insert(User)
+        .values(
+            email=email,
+            name=name,
+            password_hash=await get_password_hash(password),
+            timezone=x_timezone,
+            last_login=datetime.utcnow(),
+        )
+        .on_conflict_do_nothing(index_elements=[User.email])
+        .returning(User)
     )
-    db.add(new_user)
-    await db.flush()
+    new_user = result.scalars().first()
+    if not new_user:
+        raise BadRequestException("Email already registered")
 
     # Send welcome email
-    await send_welcome_email(new_user.email, new_user.name)
+    await enqueue_welcome_email(db, new_user.email, new_user.name)
 
-    return new_user
+    return user_serializer.response(new_user, response)
 
 
 @router.post(
     "/login",
     response_model=LoginResponse,
-    dependencies=[Depends(rate_limiter)],
+    dependencies=[Depends(login_rate_limiter)],
 )
 @router.post(
     "/login/",
     response_model=LoginResponse,
     include_in_schema=False,
+    dependencies=[Depends(login_rate_limiter)],
 )
 async def post_login(
     login_request: LoginRequest,
@@ -117,18 +140,20 @@ async def post_login(
 
     user.timezone = x_timezone
 
-    return await auth_login(response, user, device_info, db)
+    login = await auth_login(response, user, device_info, db)
+    return login_serializer.response(login, response)
 
 
 @router.post(
     "/login/google",
     response_model=LoginResponse,
-    dependencies=[Depends(rate_limiter)],
+    dependencies=[Depends(google_login_rate_limiter)],
 )
 @router.post(
     "/login/google/",
     response_model=LoginResponse,
     include_in_schema=False,
+    dependencies=[Depends(google_login_rate_limiter)],
 )
 async def post_google_login(
     google_request: GoogleLoginRequest,
@@ -155,30 +180,33 @@ async def post_google_login(
         db.add(user)
         await db.flush()
         # Send welcome email for new Google users
-        await send_welcome_email(user.email, user.name)
+        await enqueue_welcome_email(db, user.email, user.name)
     else:
         # Remove users password hash
         user.password_hash = None
         user.timezone = x_timezone
+        invalidate_cached_user(user.email)
 
     device_info = request.headers.get("user-agent")
 
-    return await auth_login(response, user, device_info, db)
+    login = await auth_login(response, user, device_info, db)
+    return login_serializer.response(login, response)
 
 
 @router.get(
     "/refresh",
     response_model=Token,
-    dependencies=[Depends(rate_limiter)],
+    dependencies=[Depends(refresh_rate_limiter)],
 )
 @router.get(
     "/refresh/",
     response_model=Token,
     include_in_schema=False,
+    dependencies=[Depends(refresh_rate_limiter)],
 )
 async def get_refresh_token(
     refresh_token: str = Cookie(None, alias="refreshToken"),
-    db: AsyncSession = Depends(get_db),
+    db: AsyncSession = Depends(get_read_db),
 ):
     if not refresh_token:
         raise UnauthorizedException("Refresh token is missing")
@@ -189,32 +217,32 @@ async def get_refresh_token(
         if email is None:
             raise UnauthorizedException("Invalid token")
 
-        # Get the user from the database
-        user = await fetch_user_by_email(email, db)
-        if not user:
-            raise NotFoundException("User not found")
-
-        # Check if the refresh token exists in the database
+        # Check the user and their refresh token in one query
         result = await db.execute(
-            select(RefreshToken).filter_by(user_id=user.id, token=refresh_token)
+            select(User.email)
+            .join(RefreshToken, RefreshToken.user_id == User.id)
+            .where(User.email == email.lower().strip())
+            .where(RefreshToken.token_hash == hash_refresh_token(refresh_token))
         )
-        existing_token = result.scalars().first()
+        user_email = result.scalars().first()
 
-        if not existing_token:
+        if not user_email:
             raise UnauthorizedException("Invalid token")
 
         # Generate a new access token
         access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
         access_token = create_access_token(
-            data={"sub": user.email}, expires_delta=access_token_expires
+            data={"sub": user_email}, expires_delta=access_token_expires
         )
         access_token_expire_days = 1 / (
             24 / (ACCESS_TOKEN_EXPIRE_MINUTES / 60)
         )  # Convert to days
 
-        return Token(
-            token=access_token,
-            expires_days=access_token_expire_days,
+        return token_serializer.response(
+            Token(
+                token=access_token,
+                expires_days=access_token_expire_days,
+            )
         )
 
     except JWTError:
@@ -237,6 +265,7 @@ async def put_user(
 
     db.add(current_user)
     await db.flush()
+    invalidate_cached_user(current_user.email)
 
     return current_user
 
@@ -245,6 +274,7 @@ async def put_user(
 @router.put("/password/", include_in_schema=False)
 async def put_change_password(
     request: ChangePasswordRequest,
+    http_request: Request,
     db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user),
 ):
@@ -253,9 +283,24 @@ async def put_change_password(
     )
     if not user:
         return {"message": "Incorrect password"}
-    current_user.password_hash = get_password_hash(request.new_password.strip())
+    current_user.password_hash = await get_password_hash(
+        request.new_password.strip()
+    )
 
     db.add(current_user)
+    invalidate_cached_user(current_user.email)
+
+    # Sign out every other device; this one keeps its refresh token and
+    # gets a new access token on its next refresh
+    revoke_user_tokens(db, current_user)
+    await db.execute(
+        delete(RefreshToken).where(
+            RefreshToken.user_id == current_user.id,
+            RefreshToken.device_info.is_distinct_from(
+                http_request.headers.get("user-agent")
+            ),
+        )
+    )
 
     return {"message": "Password updated successfully"}
 
@@ -267,24 +312,27 @@ async def post_logout(
     response: Response,
     db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user),
+    token: str = Depends(oauth2_scheme),
 ):
     device_info = request.headers.get("user-agent")
     if not device_info:
         raise BadRequestException("Device info is missing")
 
+    # Remove the refresh token from the database
     result = await db.execute(
-        select(RefreshToken).where(
+        delete(RefreshToken)
+        .where(
             RefreshToken.user_id == current_user.id,
             RefreshToken.device_info == device_info,
         )
+        .returning(RefreshToken.id)
     )
-    refresh_token = result.scalars().first()
 
-    if not refresh_token:
+    if not result.scalars().first():
         raise BadRequestException("Refresh token is missing")
-
-    # Remove the refresh token from the database
-    await db.delete(refresh_token)
+    invalidate_cached_user(current_user.email)
+    # The access token would otherwise stay valid until it expires
+    revoke_access_token(db, token)
 
     # Remove the refresh token cookie
     response.delete_cookie(
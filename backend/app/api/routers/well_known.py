@@ -0,0 +1,16 @@
+from app import config
+from app.signing import signing_keys
+from fastapi import APIRouter
+from fastapi.responses import ORJSONResponse
+
+router = APIRouter(prefix="/.well-known")
+
+
+# Public keys for verifying our access tokens without calling this API
+@router.get("/jwks.json")
+async def jwks():
+    keys = signing_keys.jwks() if signing_keys is not None else {"keys": []}
+    return ORJSONResponse(
+        keys,
+        headers={"Cache-Control": f"public, max-age={config.JWKS_MAX_AGE_SECONDS}"},
+    )
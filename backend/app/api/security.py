@@ -1,48 +1,66 @@
 import logging
-from datetime import datetime, timedelta
+from typing import Union
 
+from app import config
+from app.api.rate_limit_backends import (
+    MemoryRateLimitBackend,
+    PostgresRateLimitBackend,
+    RateLimitBackend,
+    SharedMemoryRateLimitBackend,
+)
 from app.exceptions import TooManyRequestsException
 from fastapi import Request
 
-# In-memory store for rate limiting (could be more complex, depending on requirements)
-rate_limit_store = {}
+logger = logging.getLogger(__name__)
 
-# Settings
-RATE_LIMIT = 10
-TIME_WINDOW = timedelta(minutes=1)
 
-logger = logging.getLogger(__name__)
+def create_rate_limit_backend(name: str) -> RateLimitBackend:
+    if name == "memory":
+        return MemoryRateLimitBackend(max_keys=config.RATE_LIMIT_MAX_KEYS)
+    if name == "shared_memory":
+        return SharedMemoryRateLimitBackend(
+            name=config.RATE_LIMIT_SHM_NAME, slots=config.RATE_LIMIT_SHM_SLOTS
+        )
+    if name == "postgres":
+        return PostgresRateLimitBackend()
+    raise ValueError(f"Unknown rate limit backend: {name}")
 
 
-# Custom dependency to limit rate
-async def rate_limiter(request: Request):
-    client_ip = request.client.host
-    now = datetime.utcnow()
+# Where rate limit counters live, see RATE_LIMIT_BACKEND
+rate_limit_backend = create_rate_limit_backend(config.RATE_LIMIT_BACKEND)
 
-    # Get the list of request times for the client IP
-    if client_ip in rate_limit_store:
-        request_times = rate_limit_store[client_ip]
-    else:
-        request_times = []
 
-    # Filter out requests outside the time window
-    request_times = [time for time in request_times if now - time < TIME_WINDOW]
+class RateLimiter:
+    def __init__(
+        self,
+        scope: str = "default",
+        limit: Union[int, None] = None,
+        window_seconds: Union[float, None] = None,
+    ):
+        override = config.RATE_LIMIT_OVERRIDES.get(scope, {})
+        self.scope = scope
+        if limit is None:
+            limit = override.get("limit", config.RATE_LIMIT)
+        if window_seconds is None:
+            window_seconds = override.get(
+                "window_seconds", config.RATE_LIMIT_WINDOW_SECONDS
+            )
+        # A limit of 0 blocks the scope, a window of 0 means nothing
+        if window_seconds <= 0:
+            raise ValueError(f"Rate limit window for {scope} must be positive")
+        self.limit = limit
+        self.window = window_seconds
 
-    # Check if the client has exceeded the rate limit
-    if len(request_times) >= RATE_LIMIT:
-        raise TooManyRequestsException("Too many requests")
+    async def __call__(self, request: Request):
+        key = f"{self.scope}:{request.client.host}"
+        if not await rate_limit_backend.hit(key, self.limit, self.window):
+            raise TooManyRequestsException("Too many requests")
 
-    # Add the current time to the list of request times
-    request_times.append(now)
-    rate_limit_store[client_ip] = request_times
+
+# Custom dependency to limit rate
+rate_limiter = RateLimiter()
 
 
 async def clear_rate_limit_store():
-    logger.info("Clearing rate limit store")
-    now = datetime.utcnow()
-    for ip, times in list(rate_limit_store.items()):
-        # Remove old request times
-        rate_limit_store[ip] = [t for t in times if now - t < TIME_WINDOW]
-        # Remove IP if no recent requests
-        if not rate_limit_store[ip]:
-            del rate_limit_store[ip]
+    removed = await rate_limit_backend.sweep()
+    logger.info(f"Cleared {removed} expired keys from the rate limit store")
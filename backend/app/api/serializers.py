@@ -0,0 +1,53 @@
+from typing import Any, Union
+
+from app.api.models.users import (
+    AdminUser,
+    LoginResponse,
+    Token,
+    UserInDB,
+    UserPage,
+)
+from pydantic import BaseModel
+from starlette.responses import Response
+
+
+class RawJSONResponse(Response):
+    media_type = "application/json"
+
+
+# Serializes straight to JSON bytes with the model's compiled pydantic-core
+# serializer. ORM objects are copied into the model without validation, they
+# come from our own database and already match the response models.
+class ModelSerializer:
+    def __init__(self, model: type[BaseModel]):
+        self.model = model
+        self.fields = tuple(model.model_fields)
+        self._serializer = model.__pydantic_serializer__
+
+    def construct(self, obj: Any) -> BaseModel:
+        if isinstance(obj, self.model):
+            return obj
+        return self.model.model_construct(
+            **{field: getattr(obj, field) for field in self.fields}
+        )
+
+    def to_json(self, obj: Any) -> bytes:
+        return self._serializer.to_json(self.construct(obj))
+
+    # Returning a Response skips FastAPI's response_model validation and
+    # encoding; headers set on the injected response (cookies) are kept
+    def response(self, obj: Any, response: Union[Response, None] = None) -> Response:
+        status_code = 200
+        if response is not None and response.status_code:
+            status_code = response.status_code
+        result = RawJSONResponse(self.to_json(obj), status_code=status_code)
+        if response is not None:
+            result.headers.raw.extend(response.headers.raw)
+        return result
+
+
+user_serializer = ModelSerializer(UserInDB)
+login_serializer = ModelSerializer(LoginResponse)
+token_serializer = ModelSerializer(Token)
+admin_user_serializer = ModelSerializer(AdminUser)
+user_page_serializer = ModelSerializer(UserPage)
@@ -0,0 +1,86 @@
+from collections import OrderedDict
+
+
+def window_overlap(now: float, index: int, window: float) -> float:
+    # Sliding window estimate: weight the previous window by how much of it
+    # still overlaps the last `window` seconds
+    return 1.0 - (now - index * window) / window
+
+
+class _Window:
+    # Constant-size state per key: request counts for the current and the
+    # previous fixed window, and when the state stops mattering
+    __slots__ = ("index", "previous", "current", "expires_at")
+
+    def __init__(self, index: int, expires_at: float):
+        self.index = index
+        self.previous = 0
+        self.current = 0
+        self.expires_at = expires_at
+
+
+# Keys are grouped by window length, one LRU each. Within a group the least
+# recently used key is also the first to expire, so sweeps and evictions only
+# ever look at the head of each group.
+class SlidingWindowStore:
+    def __init__(self, max_keys: int):
+        self.max_keys = max_keys
+        # window length -> key -> state, least recently used first
+        self._windows: dict[float, OrderedDict[str, _Window]] = {}
+        self._size = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def hit(self, key: str, limit: int, window: float, now: float) -> bool:
+        index = int(now // window)
+        windows = self._windows.get(window)
+        if windows is None:
+            windows = self._windows[window] = OrderedDict()
+        state = windows.get(key)
+        if state is None:
+            state = _Window(index, (index + 2) * window)
+            windows[key] = state
+            self._size += 1
+            if self._size > self.max_keys:
+                self._evict()
+        else:
+            windows.move_to_end(key)
+            if state.index != index:
+                state.previous = state.current if state.index == index - 1 else 0
+                state.current = 0
+                state.index = index
+                state.expires_at = (index + 2) * window
+
+        if state.previous * window_overlap(now, index, window) + state.current >= limit:
+            return False
+        state.current += 1
+        return True
+
+    # Drops the head that expires first, like the shared memory backend
+    # reuses the slot that expires first
+    def _evict(self):
+        windows = min(
+            (windows for windows in self._windows.values() if windows),
+            key=lambda windows: next(iter(windows.values())).expires_at,
+        )
+        windows.popitem(last=False)
+        self._size -= 1
+        self.evictions += 1
+
+    def sweep(self, now: float) -> int:
+        removed = 0
+        for windows in self._windows.values():
+            while windows:
+                key, state = next(iter(windows.items()))
+                if state.expires_at > now:
+                    break
+                del windows[key]
+                removed += 1
+        self._size -= removed
+        return removed
+
+    def clear(self):
+        self._windows.clear()
+        self._size = 0
@@ -1,20 +1,40 @@
+import hashlib
+import hmac
 import logging
+import secrets
+import time
 from datetime import datetime, timedelta
 from typing import Union
 
 import httpx
 from app import config
+from app.activity import activity_recorder
 from app.api.models.users import LoginResponse, Token
-from app.core.users import fetch_user_by_email
-from app.database.engine import get_db
+from app.cache import TTLCache
+from app.core.users import (
+    fetch_cached_user_by_email,
+    fetch_user_by_email,
+    invalidate_cached_user,
+)
+from app.database.engine import get_db, get_read_db
 from app.database.schema.tokens import RefreshToken
 from app.database.schema.users import User
-from app.exceptions import BadRequestException, NotFoundException, UnauthorizedException
+from app.exceptions import (
+    BadRequestException,
+    NotFoundException,
+    ServiceUnavailableException,
+    UnauthorizedException,
+)
+from app.hashing import password_hasher
+from app.http_client import http_client
+from app.jwks import JWKSCache
+from app.metrics import auth_timer
+from app.revocation import token_revocations
+from app.signing import signing_keys
 from fastapi import Depends, Response
 from fastapi.security import OAuth2PasswordBearer
 from jose import JWTError, jwt
-from passlib.context import CryptContext
-from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert
 from sqlalchemy.ext.asyncio import AsyncSession
 
 logger = logging.getLogger(__name__)
@@ -25,21 +45,26 @@ HASH_ALGORITHM = config.HASH_ALGORITHM
 ACCESS_TOKEN_EXPIRE_MINUTES = config.ACCESS_TOKEN_EXPIRE_MINUTES
 REFRESH_TOKEN_EXPIRE_DAYS = config.REFRESH_TOKEN_EXPIRE_DAYS
 
-# Password hashing context
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
-
 # OAuth2 scheme setup
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/token")
 
+# Verified claims keyed by token digest, each kept until the token's exp
+token_cache = TTLCache(
+    max_size=config.TOKEN_CACHE_MAX_SIZE,
+    ttl=timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS).total_seconds(),
+)
+
 
 # Create a utility function to verify password
-def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return pwd_context.verify(plain_password, hashed_password)
+async def verify_password(plain_password: str, hashed_password: str) -> bool:
+    with auth_timer("bcrypt_verify"):
+        return await password_hasher.verify(plain_password, hashed_password)
 
 
 # Create a utility function to hash password
-def get_password_hash(password: str) -> str:
-    return pwd_context.hash(password)
+async def get_password_hash(password: str) -> str:
+    with auth_timer("bcrypt_hash"):
+        return await password_hasher.hash(password)
 
 
 # Create a utility function to create access tokens
@@ -51,11 +76,24 @@ def create_access_token(
         expire = datetime.utcnow() + expires_delta
     else:
         expire = datetime.utcnow() + timedelta(minutes=15)
-    to_encode.update({"exp": expire})
-    encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=HASH_ALGORITHM)
+    # iat keeps its fraction so a revocation in the same second still
+    # separates older tokens from newer ones; jti lets one token be revoked
+    to_encode.update(
+        {"exp": expire, "iat": time.time(), "jti": secrets.token_urlsafe(16)}
+    )
+    with auth_timer("jwt_encode"):
+        if signing_keys is not None:
+            encoded_jwt = signing_keys.sign(to_encode)
+        else:
+            encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=HASH_ALGORITHM)
     return encoded_jwt
 
 
+# Refresh tokens are stored and looked up by digest only
+def hash_refresh_token(token: str) -> bytes:
+    return hashlib.sha256(token.encode()).digest()
+
+
 # Create a utility function to get user by email
 async def get_user(db: AsyncSession, email: str) -> Union[User, None]:
     user = await fetch_user_by_email(email, db)
@@ -69,17 +107,44 @@ async def authenticate_user(
     db: AsyncSession, email: str, password: str
 ) -> Union[User, None]:
     user = await get_user(db, email)
-    if not user:
+    if not user or not user.password_hash:
         return None
-    if not verify_password(password, user.password_hash):
+    if not await verify_password(password, user.password_hash):
         return None
     return user
 
 
+def _token_digest(token: str) -> bytes:
+    # Keyed on the signing settings so a new SECRET_KEY, HASH_ALGORITHM or
+    # set of signing keys never matches claims verified under the old ones
+    version = signing_keys.version if signing_keys is not None else 0
+    key = f"{HASH_ALGORITHM}:{SECRET_KEY}:{version}".encode()
+    return hmac.new(key, token.encode(), hashlib.sha256).digest()
+
+
+# Verify a JWT, skipping the signature check for tokens seen before
+def decode_token(token: str) -> dict:
+    if signing_keys is not None:
+        # Pick up rotated keys before the cache lookup depends on them
+        signing_keys.refresh()
+    digest = _token_digest(token)
+    payload = token_cache.get(digest)
+    if payload is None:
+        with auth_timer("jwt_decode"):
+            if signing_keys is not None:
+                payload = signing_keys.verify(token)
+            else:
+                payload = jwt.decode(token, SECRET_KEY, algorithms=[HASH_ALGORITHM])
+        exp = payload.get("exp")
+        if isinstance(exp, (int, float)):
+            token_cache.set(digest, payload, ttl=exp - time.time())
+    return payload
+
+
 def decode_access_token(token: str) -> Union[str, None]:
     try:
         # Decode the JWT token
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[HASH_ALGORITHM])
+        payload = decode_token(token)
 
         # Extract the subject (user's email in this case)
         email: str = payload.get("sub")
@@ -91,27 +156,64 @@ def decode_access_token(token: str) -> Union[str, None]:
         raise UnauthorizedException(f"Token is invalid or expired: {str(e)}")
 
 
-# Function to get the current user based on the JWT token
-async def get_current_user(
-    token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_db)
-) -> User:
+async def _resolve_current_user(token: str, db: AsyncSession) -> User:
     credentials_exception = UnauthorizedException("Could not validate credentials")
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[HASH_ALGORITHM])
+        payload = decode_token(token)
         email: str = payload.get("sub")
     except JWTError:
         raise credentials_exception
-    user = await get_user(db, email=email)
-    if user is None:
+    if email is None or token_revocations.is_revoked(payload):
         raise credentials_exception
+    user = await fetch_cached_user_by_email(email, db)
+    if user is None:
+        raise NotFoundException("User not found")
 
     if user.last_active < (datetime.utcnow() - timedelta(days=1)).date():
-        user.last_active = datetime.utcnow()
-        db.add(user)
-        await db.flush()
+        activity_recorder.record_active(user, datetime.utcnow())
     return user
 
 
+# Function to get the current user based on the JWT token, attached to the
+# request's write session so routes can modify it
+async def get_current_user(
+    token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_db)
+) -> User:
+    return await _resolve_current_user(token, db)
+
+
+# Same as get_current_user for routes that only read
+async def get_current_user_readonly(
+    token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_read_db)
+) -> User:
+    return await _resolve_current_user(token, db)
+
+
+# Rejected by every worker from the next sync on, by this one as soon as
+# the transaction commits
+def revoke_access_token(db: AsyncSession, token: str):
+    try:
+        payload = decode_token(token)
+    except JWTError:
+        return
+    token_revocations.revoke_token(db, payload)
+
+
+# Every token issued to the user so far
+def revoke_user_tokens(db: AsyncSession, user: User):
+    token_revocations.revoke_subject(db, user.email)
+
+
+# Users listed in ADMIN_EMAILS, everyone else gets a 404 so the admin routes
+# are not advertised
+async def get_admin_user(
+    current_user: User = Depends(get_current_user_readonly),
+) -> User:
+    if current_user.email not in config.ADMIN_EMAILS:
+        raise NotFoundException("Not found")
+    return current_user
+
+
 async def auth_login(
     response: Response, user: User, agent: str, db: AsyncSession = Depends(get_db)
 ) -> LoginResponse:
@@ -134,28 +236,27 @@ async def auth_login(
         samesite="Strict",
     )
 
-    # Check if a refresh token for this user and device already exists
-    result = await db.execute(
-        select(RefreshToken).filter_by(user_id=user.id, device_info=agent)
-    )
-    existing_token = result.scalars().first()
-
-    if existing_token:
-        # Update the existing token
-        existing_token.token = refresh_token
-        existing_token.issued_at = datetime.utcnow()
-        existing_token.expires_at = refresh_token_expires_at
-        db.add(existing_token)
-    else:
-        # Create a new token
-        new_refresh_token = RefreshToken(
+    # Create or replace the refresh token for this user and device
+    issued_at = datetime.utcnow()
+    token_hash = hash_refresh_token(refresh_token)
+    await db.execute(
+        insert(RefreshToken)
+        .values(
             user_id=user.id,
-            token=refresh_token,
+            token_hash=token_hash,
             device_info=agent,
-            issued_at=datetime.utcnow(),
+            issued_at=issued_at,
             expires_at=refresh_token_expires_at,
         )
-        db.add(new_refresh_token)
+        .on_conflict_do_update(
+            index_elements=[RefreshToken.user_id, RefreshToken.device_info],
+            set_={
+                "token_hash": token_hash,
+                "issued_at": issued_at,
+                "expires_at": refresh_token_expires_at,
+            },
+        )
+    )
 
     access_token = create_access_token(
         data={"sub": user.email},
@@ -165,15 +266,17 @@ async def auth_login(
         24 / (ACCESS_TOKEN_EXPIRE_MINUTES / 60)
     )  # Convert to days
 
-    user.last_login = datetime.utcnow()
-    db.add(user)
+    # Written behind by the activity recorder
+    last_login = datetime.utcnow()
+    activity_recorder.record_login(user, last_login)
     await db.flush()
+    invalidate_cached_user(user.email)
 
     return LoginResponse(
         email=user.email,
         name=user.name,
         timezone=user.timezone,
-        last_login=user.last_login,
+        last_login=last_login,
         access_token=Token(
             token=access_token,
             expires_days=access_token_expire_days,
@@ -181,37 +284,52 @@ async def auth_login(
     )
 
 
+# Google's public keys for verifying ID tokens locally
+google_keys = JWKSCache(config.GOOGLE_JWKS_URL, algorithm="RS256")
+
+
+async def verify_google_id_token(id_token: str, access_token: str) -> dict:
+    header = jwt.get_unverified_header(id_token)
+    key = await google_keys.get_key(header.get("kid"))
+    with auth_timer("google_id_token_decode"):
+        return jwt.decode(
+            id_token,
+            key,
+            algorithms=["RS256"],
+            audience=config.GOOGLE_CLIENT_ID,
+            issuer=config.GOOGLE_ISSUERS,
+            access_token=access_token,
+        )
+
+
 async def login_with_google(auth_code: str) -> tuple[str, str, bool]:
     try:
-        async with httpx.AsyncClient() as client:
-            data = {
-                "code": auth_code,
-                "client_id": config.GOOGLE_CLIENT_ID,  # client ID from the credential at google developer console
-                "client_secret": config.GOOGLE_SECRET_KEY,  # client secret from the credential at google developer console
-                "redirect_uri": "postmessage",
-                "grant_type": "authorization_code",
-            }
-            google_response = await client.post(
-                "https://oauth2.googleapis.com/token", data=data
-            )
-
-            token_data = google_response.json()
-            google_access_token = token_data["access_token"]
-
-            headers = {"Authorization": f"Bearer {google_access_token}"}
-
-            user_info_response = await client.get(
-                "https://www.googleapis.com/oauth2/v3/userinfo", headers=headers
-            )
-
-            user_info = user_info_response.json()
-
-            email = user_info.get("email")
-            name = user_info.get("name")
-            email_verified = user_info.get("email_verified")
-
-            return email, name, email_verified
+        data = {
+            "code": auth_code,
+            "client_id": config.GOOGLE_CLIENT_ID,  # client ID from the credential at google developer console
+            "client_secret": config.GOOGLE_SECRET_KEY,  # client secret from the credential at google developer console
+            "redirect_uri": "postmessage",
+            "grant_type": "authorization_code",
+        }
+        google_response = await http_client.post(config.GOOGLE_TOKEN_URL, data=data)
+
+        token_data = google_response.json()
+
+        # The ID token already carries the profile claims, so verify it
+        # locally instead of calling the userinfo endpoint
+        claims = await verify_google_id_token(
+            token_data["id_token"], token_data["access_token"]
+        )
+
+        email = claims.get("email")
+        name = claims.get("name")
+        email_verified = claims.get("email_verified") in (True, "true")
+
+        return email, name, email_verified
     except KeyError as e:
         raise BadRequestException(f"Missing key: {str(e)}")
     except JWTError:
         raise UnauthorizedException("Invalid token")
+    except httpx.HTTPError as e:
+        logger.error(f"Google login request failed: {str(e)}")
+        raise ServiceUnavailableException("Google login is unavailable")
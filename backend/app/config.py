@@ -1,5 +1,6 @@
 import json
 import os
+import tempfile
 
 from dotenv import load_dotenv
 
@@ -20,3 +21,126 @@ EMAIL_LOGIN = os.environ.get("EMAIL_LOGIN")
 EMAIL_SENDER = os.environ.get("EMAIL_SENDER")
 EMAIL_PASSWORD = os.environ.get("EMAIL_PASSWORD")
 SEND_EMAILS = os.environ.get("SEND_EMAILS", "True") == "True"
+PASSWORD_HASH_EXECUTOR = os.environ.get("PASSWORD_HASH_EXECUTOR", "thread")
+PASSWORD_HASH_WORKERS = int(
+    os.environ.get("PASSWORD_HASH_WORKERS", str(os.cpu_count() or 1))
+)
+PASSWORD_HASH_MAX_PENDING = int(os.environ.get("PASSWORD_HASH_MAX_PENDING", "64"))
+USER_CACHE_MAX_SIZE = int(os.environ.get("USER_CACHE_MAX_SIZE", "10000"))
+USER_CACHE_TTL_SECONDS = float(os.environ.get("USER_CACHE_TTL_SECONDS", "60"))
+TOKEN_CACHE_MAX_SIZE = int(os.environ.get("TOKEN_CACHE_MAX_SIZE", "50000"))
+RATE_LIMIT = int(os.environ.get("RATE_LIMIT", "10"))
+RATE_LIMIT_WINDOW_SECONDS = float(os.environ.get("RATE_LIMIT_WINDOW_SECONDS", "60"))
+RATE_LIMIT_MAX_KEYS = int(os.environ.get("RATE_LIMIT_MAX_KEYS", "100000"))
+# Per-route limits, e.g. {"login": {"limit": 5, "window_seconds": 60}}
+RATE_LIMIT_OVERRIDES = json.loads(os.environ.get("RATE_LIMIT_OVERRIDES", "{}"))
+# One of "memory" (per worker), "shared_memory" (per host) or "postgres"
+RATE_LIMIT_BACKEND = os.environ.get("RATE_LIMIT_BACKEND", "shared_memory")
+RATE_LIMIT_SHM_NAME = os.environ.get("RATE_LIMIT_SHM_NAME", "saas-launchpad-rate-limit")
+RATE_LIMIT_SHM_SLOTS = int(os.environ.get("RATE_LIMIT_SHM_SLOTS", "131072"))
+EMAIL_SMTP_HOST = os.environ.get("EMAIL_SMTP_HOST", "smtp.gmail.com")
+EMAIL_SMTP_PORT = int(os.environ.get("EMAIL_SMTP_PORT", "465"))
+EMAIL_SMTP_USE_TLS = os.environ.get("EMAIL_SMTP_USE_TLS", "True") == "True"
+EMAIL_OUTBOX_BATCH_SIZE = int(os.environ.get("EMAIL_OUTBOX_BATCH_SIZE", "50"))
+EMAIL_OUTBOX_POLL_SECONDS = float(os.environ.get("EMAIL_OUTBOX_POLL_SECONDS", "5"))
+EMAIL_OUTBOX_MAX_ATTEMPTS = int(os.environ.get("EMAIL_OUTBOX_MAX_ATTEMPTS", "8"))
+EMAIL_OUTBOX_RETRY_SECONDS = float(os.environ.get("EMAIL_OUTBOX_RETRY_SECONDS", "30"))
+HTTP_MAX_CONNECTIONS = int(os.environ.get("HTTP_MAX_CONNECTIONS", "100"))
+HTTP_MAX_KEEPALIVE_CONNECTIONS = int(
+    os.environ.get("HTTP_MAX_KEEPALIVE_CONNECTIONS", "20")
+)
+HTTP_KEEPALIVE_SECONDS = float(os.environ.get("HTTP_KEEPALIVE_SECONDS", "60"))
+HTTP_CONNECT_TIMEOUT_SECONDS = float(
+    os.environ.get("HTTP_CONNECT_TIMEOUT_SECONDS", "3")
+)
+HTTP_READ_TIMEOUT_SECONDS = float(os.environ.get("HTTP_READ_TIMEOUT_SECONDS", "10"))
+HTTP_RETRIES = int(os.environ.get("HTTP_RETRIES", "2"))
+GOOGLE_TOKEN_URL = os.environ.get(
+    "GOOGLE_TOKEN_URL", "https://oauth2.googleapis.com/token"
+)
+GOOGLE_JWKS_URL = os.environ.get(
+    "GOOGLE_JWKS_URL", "https://www.googleapis.com/oauth2/v3/certs"
+)
+GOOGLE_ISSUERS = json.loads(
+    os.environ.get(
+        "GOOGLE_ISSUERS", '["https://accounts.google.com", "accounts.google.com"]'
+    )
+)
+REFRESH_TOKEN_PURGE_BATCH_SIZE = int(
+    os.environ.get("REFRESH_TOKEN_PURGE_BATCH_SIZE", "1000")
+)
+REFRESH_TOKEN_PURGE_PAUSE_SECONDS = float(
+    os.environ.get("REFRESH_TOKEN_PURGE_PAUSE_SECONDS", "0.05")
+)
+ACTIVITY_FLUSH_SECONDS = float(os.environ.get("ACTIVITY_FLUSH_SECONDS", "10"))
+DATABASE_REPLICA_URL = os.environ.get("DATABASE_REPLICA_URL", "").replace(
+    "?sslmode=require", ""
+)
+# How long a client's reads stay on the primary after it wrote something
+READ_AFTER_WRITE_SECONDS = float(os.environ.get("READ_AFTER_WRITE_SECONDS", "5"))
+# Migrations own the schema, this is only for throwaway local databases
+DB_CREATE_TABLES = os.environ.get("DB_CREATE_TABLES", "False") == "True"
+DB_POOL_WARM_CONNECTIONS = int(os.environ.get("DB_POOL_WARM_CONNECTIONS", "5"))
+STARTUP_WARMUP = os.environ.get("STARTUP_WARMUP", "True") == "True"
+# Connection budget for the whole service, split evenly between the workers
+DB_MAX_CONNECTIONS = int(os.environ.get("DB_MAX_CONNECTIONS", "30"))
+WEB_CONCURRENCY = int(os.environ.get("WEB_CONCURRENCY", "1"))
+# Explicit per-worker sizes, derived from DB_MAX_CONNECTIONS when unset
+DB_POOL_SIZE = os.environ.get("DB_POOL_SIZE")
+DB_MAX_OVERFLOW = os.environ.get("DB_MAX_OVERFLOW")
+DB_POOL_TIMEOUT_SECONDS = float(os.environ.get("DB_POOL_TIMEOUT_SECONDS", "30"))
+DB_POOL_RECYCLE_SECONDS = int(os.environ.get("DB_POOL_RECYCLE_SECONDS", "1800"))
+DB_HEALTH_CACHE_SECONDS = float(os.environ.get("DB_HEALTH_CACHE_SECONDS", "5"))
+DB_HEALTH_TIMEOUT_SECONDS = float(os.environ.get("DB_HEALTH_TIMEOUT_SECONDS", "2"))
+METRICS_ENABLED = os.environ.get("METRICS_ENABLED", "True") == "True"
+# Every worker writes its metrics under here, stale runs are removed on startup
+METRICS_DIR = os.environ.get(
+    "METRICS_DIR", os.path.join(tempfile.gettempdir(), "saas-launchpad-metrics")
+)
+METRICS_FLUSH_SECONDS = float(os.environ.get("METRICS_FLUSH_SECONDS", "5"))
+# Client addresses allowed to scrape /metrics, an empty list allows everyone
+METRICS_ALLOWED_CLIENTS = json.loads(
+    os.environ.get("METRICS_ALLOWED_CLIENTS", '["127.0.0.1", "::1"]')
+)
+# Records every statement per request, adds Server-Timing headers and logs
+# slow requests. Timing headers reveal work done per request, keep it off in
+# production.
+SQL_PROFILER_ENABLED = os.environ.get("SQL_PROFILER_ENABLED", "False") == "True"
+SLOW_REQUEST_SECONDS = float(os.environ.get("SLOW_REQUEST_SECONDS", "0.5"))
+# "json" for structured records, "text" for the plain format
+LOG_FORMAT = os.environ.get("LOG_FORMAT", "json")
+LOG_QUEUE_SIZE = int(os.environ.get("LOG_QUEUE_SIZE", "10000"))
+# Per exception type, e.g. {"UnauthorizedException": {"max_per_second": 5, "sample_rate": 0.1}}
+LOG_SAMPLING = json.loads(os.environ.get("LOG_SAMPLING", "{}"))
+LOG_SAMPLE_MAX_PER_SECOND = int(os.environ.get("LOG_SAMPLE_MAX_PER_SECOND", "10"))
+# Private keys (<kid>.pem) and verification-only keys (<kid>.pub.pem) used
+# when OAUTH_HASH_ALGORITHM is RS* or ES*
+JWT_KEYS_DIR = os.environ.get("JWT_KEYS_DIR", "keys")
+# Signs with the newest private key when unset
+JWT_SIGNING_KID = os.environ.get("JWT_SIGNING_KID")
+JWT_KEYS_RELOAD_SECONDS = float(os.environ.get("JWT_KEYS_RELOAD_SECONDS", "30"))
+# Unix time of the move to RS*/ES* signing. SECRET_KEY tokens without a kid
+# issued before it are accepted until it plus ACCESS_TOKEN_EXPIRE_MINUTES;
+# when unset they are rejected outright.
+JWT_LEGACY_SWITCHED_AT = os.environ.get("JWT_LEGACY_SWITCHED_AT")
+# OAUTH_HASH_ALGORITHM before the switch
+JWT_LEGACY_ALGORITHM = os.environ.get("JWT_LEGACY_ALGORITHM", "HS256")
+JWKS_MAX_AGE_SECONDS = int(os.environ.get("JWKS_MAX_AGE_SECONDS", "300"))
+# Users allowed to call the /api/admin routes
+ADMIN_EMAILS = [
+    email.lower().strip()
+    for email in json.loads(os.environ.get("ADMIN_EMAILS", "[]"))
+]
+# Rows fetched per round trip from the server-side cursor when exporting
+EXPORT_BATCH_SIZE = int(os.environ.get("EXPORT_BATCH_SIZE", "1000"))
+ADMIN_PAGE_SIZE = int(os.environ.get("ADMIN_PAGE_SIZE", "50"))
+ADMIN_MAX_PAGE_SIZE = int(os.environ.get("ADMIN_MAX_PAGE_SIZE", "500"))
+# How often each worker pulls the access tokens revoked by the others
+TOKEN_REVOCATION_SYNC_SECONDS = float(
+    os.environ.get("TOKEN_REVOCATION_SYNC_SECONDS", "2")
+)
+# Every pull re-reads this much history, covering rows that committed late
+# and clock differences between nodes
+TOKEN_REVOCATION_SYNC_OVERLAP_SECONDS = float(
+    os.environ.get("TOKEN_REVOCATION_SYNC_OVERLAP_SECONDS", "10")
+)
@@ -0,0 +1,75 @@
+import base64
+from datetime import date, datetime
+from typing import Union
+
+import orjson
+from app.database.schema.users import User
+from sqlalchemy import Select, select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+
+
+# Filters shared by the admin listing and the export
+def filter_users(
+    query: Select,
+    has_access: Union[bool, None] = None,
+    created_after: Union[datetime, None] = None,
+    created_before: Union[datetime, None] = None,
+    active_after: Union[date, None] = None,
+    active_before: Union[date, None] = None,
+    email_prefix: Union[str, None] = None,
+) -> Select:
+    if has_access is not None:
+        query = query.filter(User.has_access == has_access)
+    if created_after is not None:
+        query = query.filter(User.created_at >= created_after)
+    if created_before is not None:
+        query = query.filter(User.created_at < created_before)
+    if active_after is not None:
+        query = query.filter(User.last_active >= active_after)
+    if active_before is not None:
+        query = query.filter(User.last_active < active_before)
+    email_prefix = (email_prefix or "").lower().strip()
+    if email_prefix:
+        # What Postgres turns LIKE 'prefix%' into, spelled out so the range
+        # is also used by the cached generic plans of prepared statements
+        upper = email_prefix[:-1] + chr(ord(email_prefix[-1]) + 1)
+        query = query.filter(
+            User.email.op("~>=~")(email_prefix), User.email.op("~<~")(upper)
+        )
+    return query
+
+
+# Opaque position of the last user on a page
+def encode_cursor(user: User) -> str:
+    position = orjson.dumps([user.created_at, user.id])
+    return base64.urlsafe_b64encode(position).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple[datetime, int]:
+    try:
+        created_at, user_id = orjson.loads(
+            base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        )
+        return datetime.fromisoformat(created_at), int(user_id)
+    except (ValueError, TypeError):
+        raise ValueError("Invalid cursor")
+
+
+# Newest users first. Pages continue after the cursor's (created_at, id)
+# instead of using OFFSET, so every page is an index range scan that costs
+# the same however deep it is.
+async def list_users(
+    db: AsyncSession, limit: int, cursor: Union[str, None] = None, **filters
+) -> tuple[list[User], Union[str, None]]:
+    query = filter_users(select(User), **filters)
+    if cursor:
+        created_at, user_id = decode_cursor(cursor)
+        query = query.filter(tuple_(User.created_at, User.id) < (created_at, user_id))
+    query = query.order_by(User.created_at.desc(), User.id.desc()).limit(limit + 1)
+
+    users = list((await db.execute(query)).scalars())
+    next_cursor = None
+    if len(users) > limit:
+        users = users[:limit]
+        next_cursor = encode_cursor(users[-1])
+    return users, next_cursor
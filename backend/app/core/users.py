@@ -1,8 +1,59 @@
+from typing import Union
+
+from app import config
+from app.cache import TTLCache
 from app.database.schema.users import User
+from app.metrics import metrics
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import make_transient_to_detached
+
+# Per-worker cache of users keyed by email (the token's "sub"). Entries are
+# detached snapshots so they are never shared between sessions.
+user_cache = TTLCache(
+    max_size=config.USER_CACHE_MAX_SIZE, ttl=config.USER_CACHE_TTL_SECONDS
+)
+
+
+def _collect_user_cache():
+    metrics.set("cache_lookups_total", ("user", "hit"), user_cache.hits)
+    metrics.set("cache_lookups_total", ("user", "miss"), user_cache.misses)
+    metrics.set("cache_evictions_total", ("user",), user_cache.evictions)
+    metrics.set("cache_entries", ("user",), len(user_cache))
+
+
+metrics.add_collector(_collect_user_cache)
 
 
 async def fetch_user_by_email(email: str, db: AsyncSession) -> User:
     result = await db.execute(select(User).filter(User.email == email.lower().strip()))
     return result.scalars().first()
+
+
+def _snapshot_user(user: User) -> User:
+    snapshot = User(
+        **{
+            column.key: getattr(user, column.key)
+            for column in User.__table__.columns
+        }
+    )
+    make_transient_to_detached(snapshot)
+    return snapshot
+
+
+async def fetch_cached_user_by_email(email: str, db: AsyncSession) -> User:
+    email = email.lower().strip()
+    snapshot = user_cache.get(email)
+    if snapshot is not None:
+        # Attach a copy to this session without emitting a SELECT
+        return await db.merge(snapshot, load=False)
+
+    user = await fetch_user_by_email(email, db)
+    if user is not None:
+        user_cache.set(email, _snapshot_user(user))
+    return user
+
+
+def invalidate_cached_user(email: Union[str, None]):
+    if email:
+        user_cache.invalidate(email.lower().strip())
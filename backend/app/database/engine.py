@@ -1,56 +1,117 @@
+import asyncio
 import ssl
+import time
 
 from app import config
+from app.database.pool_metrics import PoolMetrics, TimedQueuePool
 from app.database.schema.schema import Base
-from sqlalchemy import create_engine
+from app.metrics import instrument_engine
+from fastapi import Request, Response
 from sqlalchemy.exc import SQLAlchemyError
-from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.ext.asyncio import AsyncEngine, async_sessionmaker, create_async_engine
 
 DATABASE_URL = config.DATABASE_URL
 
+# Clients that wrote recently carry this cookie so their reads skip the replica
+READ_PRIMARY_COOKIE = "readPrimaryUntil"
 
-# Add this at the end of the file
-def init_db() -> sessionmaker:
-    engine = create_engine(DATABASE_URL.replace("+asyncpg", ""))
-    Base.metadata.create_all(engine)
-    SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
-    return SessionLocal
 
+def pool_limits() -> tuple[int, int]:
+    # Each worker gets its own pool, so split the service-wide budget
+    per_worker = max(1, config.DB_MAX_CONNECTIONS // max(1, config.WEB_CONCURRENCY))
+    if config.DB_POOL_SIZE is not None:
+        pool_size = int(config.DB_POOL_SIZE)
+    else:
+        pool_size = max(1, per_worker * 2 // 3)
+    if config.DB_MAX_OVERFLOW is not None:
+        max_overflow = int(config.DB_MAX_OVERFLOW)
+    else:
+        max_overflow = max(0, per_worker - pool_size)
+    return pool_size, max_overflow
 
-if config.USE_SSL:
-    # Create an SSL context if SSL is required
-    ssl_context = ssl.create_default_context()
-    # Optional: Do not verify the server certificate (not recommended for production)
-    ssl_context.check_hostname = False
-    ssl_context.verify_mode = ssl.CERT_NONE
 
+def _create_engine(url: str, metrics: PoolMetrics) -> AsyncEngine:
+    connect_args = {}
+    if config.USE_SSL:
+        # Create an SSL context if SSL is required
+        ssl_context = ssl.create_default_context()
+        # Optional: Do not verify the server certificate (not recommended for production)
+        ssl_context.check_hostname = False
+        ssl_context.verify_mode = ssl.CERT_NONE
+        connect_args["ssl"] = ssl_context
+
+    pool_size, max_overflow = pool_limits()
     engine = create_async_engine(
-        DATABASE_URL,
+        url,
         echo=False,
-        connect_args={"ssl": ssl_context},
-        pool_size=20,  # Maximum number of persistent connections
-        max_overflow=10,  # Maximum number of additional connections created
-        pool_timeout=30,  # Seconds to wait before timing out on getting a connection
-        pool_recycle=1800,  # Recycle connections after 30 minutes
+        connect_args=connect_args,
+        poolclass=TimedQueuePool,
+        pool_size=pool_size,  # Maximum number of persistent connections
+        max_overflow=max_overflow,  # Maximum number of additional connections created
+        pool_timeout=config.DB_POOL_TIMEOUT_SECONDS,  # Seconds to wait for a connection
+        pool_recycle=config.DB_POOL_RECYCLE_SECONDS,  # Recycle connections after this long
         pool_pre_ping=True,  # Enable connection health checks
     )
-else:
-    # Create the async engine without SSL configuration
-    engine = create_async_engine(
-        DATABASE_URL,
-        echo=False,
-        pool_size=20,
-        max_overflow=10,
-        pool_timeout=30,
-        pool_recycle=1800,
-        pool_pre_ping=True,
-    )
+    metrics.attach(engine, max_overflow)
+    instrument_engine(engine)
+    return engine
+
+
+pool_metrics = PoolMetrics()
+replica_pool_metrics = PoolMetrics()
+engine = _create_engine(DATABASE_URL, pool_metrics)
+# Optional read replica with its own pool
+replica_engine = (
+    _create_engine(config.DATABASE_REPLICA_URL, replica_pool_metrics)
+    if config.DATABASE_REPLICA_URL
+    else None
+)
 
 AsyncSessionLocal = async_sessionmaker(engine, expire_on_commit=False)
 
 
-async def get_db():
+async def create_tables():
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+
+
+# Open connections concurrently so the first requests skip connection setup
+async def warm_pool(engine: AsyncEngine, connections: int):
+    # Anything beyond the pool size would be overflow, closed again on checkin
+    connections = min(connections, engine.sync_engine.pool.size())
+    pending = [engine.connect() for _ in range(connections)]
+    try:
+        await asyncio.gather(*(conn.start() for conn in pending))
+    finally:
+        await asyncio.gather(*(conn.close() for conn in pending))
+
+
+# Read sessions run in READ ONLY transactions and are never committed
+PrimaryReadSessionLocal = async_sessionmaker(
+    engine.execution_options(postgresql_readonly=True), expire_on_commit=False
+)
+ReplicaReadSessionLocal = (
+    async_sessionmaker(
+        replica_engine.execution_options(postgresql_readonly=True),
+        expire_on_commit=False,
+    )
+    if replica_engine is not None
+    else PrimaryReadSessionLocal
+)
+
+
+# Session for routes that write
+async def get_db(response: Response):
+    if replica_engine is not None:
+        # Keep this client's reads on the primary until the replica catches up
+        response.set_cookie(
+            key=READ_PRIMARY_COOKIE,
+            value=str(time.time() + config.READ_AFTER_WRITE_SECONDS),
+            max_age=int(config.READ_AFTER_WRITE_SECONDS) + 1,
+            httponly=True,
+            samesite="Lax",
+        )
+
     async with AsyncSessionLocal() as session:
         try:
             yield session
@@ -58,3 +119,21 @@ async def get_db():
         except SQLAlchemyError as e:
             await session.rollback()
             raise e
+
+
+def _reads_primary(request: Request) -> bool:
+    try:
+        return float(request.cookies.get(READ_PRIMARY_COOKIE, 0)) > time.time()
+    except ValueError:
+        return False
+
+
+# Session for routes that only read, served by the replica when there is one
+async def get_read_db(request: Request):
+    if _reads_primary(request):
+        session_factory = PrimaryReadSessionLocal
+    else:
+        session_factory = ReplicaReadSessionLocal
+
+    async with session_factory() as session:
+        yield session
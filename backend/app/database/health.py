@@ -0,0 +1,43 @@
+import asyncio
+import logging
+import time
+
+from app import config
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+logger = logging.getLogger(__name__)
+
+
+# Readiness probes can hit every worker every few seconds, so the result of a
+# ping is reused for DB_HEALTH_CACHE_SECONDS and concurrent probes share one
+class DatabaseHealth:
+    def __init__(self, engine: AsyncEngine):
+        self.engine = engine
+        self._lock = asyncio.Lock()
+        self._result = None
+        self._checked_at = 0.0
+
+    async def _select_one(self):
+        async with self.engine.connect() as conn:
+            await conn.execute(text("SELECT 1"))
+
+    async def _ping(self) -> dict:
+        started = time.perf_counter()
+        try:
+            # Bounds the checkout too, an exhausted pool or unreachable
+            # server would otherwise hold the lock for the pool timeout
+            await asyncio.wait_for(
+                self._select_one(), timeout=config.DB_HEALTH_TIMEOUT_SECONDS
+            )
+        except Exception as e:
+            logger.error(f"Database ping failed: {e.__class__.__name__}: {str(e)}")
+            return {"ok": False, "error": e.__class__.__name__}
+        return {"ok": True, "latency_ms": (time.perf_counter() - started) * 1000}
+
+    async def check(self) -> dict:
+        async with self._lock:
+            if time.monotonic() - self._checked_at >= config.DB_HEALTH_CACHE_SECONDS:
+                self._result = await self._ping()
+                self._checked_at = time.monotonic()
+        return {**self._result, "age_seconds": time.monotonic() - self._checked_at}
@@ -0,0 +1,86 @@
+import time
+
+from app.metrics import Histogram
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+# Upper bounds in seconds, the last bucket catches everything slower
+CHECKOUT_WAIT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5)
+
+
+class PoolMetrics:
+    def __init__(self):
+        self.checkout_wait = Histogram(CHECKOUT_WAIT_BUCKETS)
+        self.checkouts = 0
+        self.connects = 0
+        self.recycled = 0
+        self.invalidated = 0
+        self.pool = None
+        self.max_overflow = 0
+
+    # max_overflow is the value the pool was configured with, QueuePool has
+    # no public accessor for it
+    def attach(self, engine: AsyncEngine, max_overflow: int):
+        self.max_overflow = max_overflow
+        pool = engine.sync_engine.pool
+        pool.metrics = self
+        self.pool = pool
+        event.listen(engine.sync_engine, "checkout", self._on_checkout)
+        event.listen(engine.sync_engine, "connect", self._on_connect)
+        event.listen(engine.sync_engine, "invalidate", self._on_invalidate)
+
+    def _on_checkout(self, dbapi_connection, connection_record, connection_proxy):
+        self.checkouts += 1
+
+    def _on_connect(self, dbapi_connection, connection_record):
+        # record_info survives reconnects, so a second connect on the same
+        # record means it was replaced: recycled by age, or after pre-ping or
+        # an error invalidated it
+        record_info = connection_record.record_info
+        if not record_info.get("connected"):
+            record_info["connected"] = True
+        elif not record_info.pop("invalidated", False):
+            self.recycled += 1
+        self.connects += 1
+
+    def _on_invalidate(self, dbapi_connection, connection_record, exception):
+        connection_record.record_info["invalidated"] = True
+        self.invalidated += 1
+
+    def stats(self) -> dict:
+        pool = self.pool
+        return {
+            "size": pool.size(),
+            "max_overflow": self.max_overflow,
+            "checked_out": pool.checkedout(),
+            "idle": pool.checkedin(),
+            "overflow_in_use": max(pool.overflow(), 0),
+            "checkouts": self.checkouts,
+            "connects": self.connects,
+            "recycled": self.recycled,
+            "invalidated": self.invalidated,
+            "checkout_wait_seconds": self.checkout_wait.stats(),
+        }
+
+
+# Times how long a checkout waits for a free connection, which pool events
+# cannot see since they only fire once a connection has been handed out
+class TimedQueuePool(AsyncAdaptedQueuePool):
+    metrics = None
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            if self.metrics is not None:
+                self.metrics.checkout_wait.observe(time.perf_counter() - started)
+
+    def recreate(self):
+        # engine.dispose() swaps in a new pool, keep feeding the same metrics
+        pool = super().recreate()
+        if self.metrics is not None:
+            self.metrics.pool = pool
+            pool.metrics = self.metrics
+        return pool
@@ -0,0 +1,41 @@
+from datetime import datetime
+
+from app.database.schema.schema import Base
+from sqlalchemy import (
+    Column,
+    DateTime,
+    Index,
+    Integer,
+    Text,
+    func,
+)
+from sqlalchemy.orm import Mapped
+
+
+class OutboxEmail(Base):
+    __tablename__ = "email_outbox"
+
+    id: Mapped[int] = Column(Integer, primary_key=True, index=True)
+    recipient: Mapped[str] = Column(Text, nullable=False)
+    subject: Mapped[str] = Column(Text, nullable=False)
+    text_body: Mapped[str] = Column(Text, nullable=False)
+    html_body: Mapped[str] = Column(Text, nullable=True)
+    attempts: Mapped[int] = Column(Integer, nullable=False, default=0)
+    last_error: Mapped[str] = Column(Text, nullable=True)
+    created_at: Mapped[datetime] = Column(
+        DateTime(timezone=True), nullable=False, server_default=func.now()
+    )
+    next_attempt_at: Mapped[datetime] = Column(
+        DateTime(timezone=True), nullable=False, server_default=func.now()
+    )
+    sent_at: Mapped[datetime] = Column(DateTime(timezone=True), nullable=True)
+    failed_at: Mapped[datetime] = Column(DateTime(timezone=True), nullable=True)
+
+    __table_args__ = (
+        # Only unsent emails are ever polled for
+        Index(
+            "ix_email_outbox_pending",
+            "next_attempt_at",
+            postgresql_where=sent_at.is_(None) & failed_at.is_(None),
+        ),
+    )
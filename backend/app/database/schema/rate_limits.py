@@ -0,0 +1,24 @@
+from datetime import datetime
+
+from app.database.schema.schema import Base
+from sqlalchemy import (
+    BigInteger,
+    Column,
+    DateTime,
+    Integer,
+    Text,
+)
+from sqlalchemy.orm import Mapped
+
+
+class RateLimitCounter(Base):
+    __tablename__ = "rate_limit_counters"
+    # Counters are disposable, so skip the WAL
+    __table_args__ = {"prefixes": ["UNLOGGED"]}
+
+    key: Mapped[str] = Column(Text, primary_key=True)
+    window_index: Mapped[int] = Column(BigInteger, primary_key=True)
+    count: Mapped[int] = Column(Integer, nullable=False, default=0)
+    expires_at: Mapped[datetime] = Column(
+        DateTime(timezone=True), nullable=False, index=True
+    )
@@ -0,0 +1,22 @@
+from datetime import datetime
+
+from app.database.schema.schema import Base
+from sqlalchemy import BigInteger, Column, DateTime, Text
+from sqlalchemy.orm import Mapped
+
+
+class RevokedToken(Base):
+    __tablename__ = "revoked_tokens"
+    id: Mapped[int] = Column(BigInteger, primary_key=True)
+    # Either one access token by its jti claim, or every token issued to
+    # subject before revoked_at
+    jti: Mapped[str] = Column(Text)
+    subject: Mapped[str] = Column(Text)
+    # Also the position workers sync from
+    revoked_at: Mapped[datetime] = Column(
+        DateTime(timezone=True), nullable=False, index=True
+    )
+    # When every token it applies to has expired and the row can be purged
+    expires_at: Mapped[datetime] = Column(
+        DateTime(timezone=True), nullable=False, index=True
+    )
@@ -5,7 +5,9 @@ from sqlalchemy import (
     Column,
     DateTime,
     ForeignKey,
+    Index,
     Integer,
+    LargeBinary,
     String,
 )
 from sqlalchemy.orm import Mapped
@@ -13,13 +15,35 @@ from sqlalchemy.orm import Mapped
 
 class RefreshToken(Base):
     __tablename__ = "user_refresh_tokens"
-    id: Mapped[int] = Column(Integer, primary_key=True, index=True)
+    id: Mapped[int] = Column(Integer, primary_key=True)
     user_id: Mapped[int] = Column(
         Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False
     )
-    token: Mapped[str] = Column(String, unique=True, index=True, nullable=False)
+    # SHA-256 of the refresh token JWT, the token itself is never stored
+    token_hash: Mapped[bytes] = Column(LargeBinary(32), nullable=False)
     device_info: Mapped[str] = Column(String)
     issued_at: Mapped[datetime] = Column(
         DateTime(timezone=True), default=datetime.utcnow
     )
-    expires_at: Mapped[datetime] = Column(DateTime(timezone=True), nullable=False)
+    expires_at: Mapped[datetime] = Column(
+        DateTime(timezone=True), nullable=False, index=True
+    )
+
+    __table_args__ = (
+        # One refresh token per device, also the conflict target for upserts
+        # and the lookup used by logout
+        Index(
+            "ix_user_refresh_tokens_user_device",
+            "user_id",
+            "device_info",
+            unique=True,
+            postgresql_nulls_not_distinct=True,
+        ),
+        # Lookup used by refresh
+        Index(
+            "ix_user_refresh_tokens_user_token",
+            "user_id",
+            "token_hash",
+            unique=True,
+        ),
+    )
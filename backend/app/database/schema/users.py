@@ -6,6 +6,7 @@ from sqlalchemy import (
     Column,
     Date,
     DateTime,
+    Index,
     Integer,
     Text,
 )
@@ -30,3 +31,18 @@ class User(Base):
         Date, nullable=False, default=datetime.utcnow
     )
     has_access: Mapped[bool] = Column(Boolean, nullable=False, default=False)
+
+    __table_args__ = (
+        # Keyset pagination of the admin listing, newest first
+        Index("ix_users_created_at_id", "created_at", "id"),
+        # Same order restricted to users with or without access
+        Index("ix_users_has_access_created_at_id", "has_access", "created_at", "id"),
+        Index("ix_users_last_active", "last_active"),
+        # Email prefix search, LIKE 'prefix%' only uses a pattern_ops index
+        # unless the database collation is C
+        Index(
+            "ix_users_email_pattern",
+            "email",
+            postgresql_ops={"email": "text_pattern_ops"},
+        ),
+    )
@@ -1,14 +1,203 @@
+import asyncio
 import logging
+import time
+from datetime import datetime, timedelta, timezone
 from email.mime.multipart import MIMEMultipart
 from email.mime.text import MIMEText
 
 import aiosmtplib
 from app import config
+from app.database.engine import AsyncSessionLocal
+from app.database.schema.emails import OutboxEmail
+from app.metrics import metrics
+from sqlalchemy import event, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
 
 logger = logging.getLogger(__name__)
 
+# How long a claimed email is hidden from other senders while it is sent
+CLAIM_LEASE = timedelta(minutes=5)
+MAX_RETRY_DELAY = timedelta(hours=1)
 
-async def send_welcome_email(email: str, name: str):
+
+class EmailOutbox:
+    def __init__(
+        self,
+        batch_size: int,
+        poll_interval: float,
+        max_attempts: int,
+        retry_delay: float,
+    ):
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.max_attempts = max_attempts
+        self.retry_delay = timedelta(seconds=retry_delay)
+        self._smtp: aiosmtplib.SMTP | None = None
+        self._task: asyncio.Task | None = None
+        self._wakeup = asyncio.Event()
+        self._stopping = False
+
+    async def enqueue(
+        self, db: AsyncSession, recipient: str, subject: str, text: str, html: str
+    ):
+        db.add(
+            OutboxEmail(
+                recipient=recipient, subject=subject, text_body=text, html_body=html
+            )
+        )
+        # Wake the sender once the email is actually visible to it
+        event.listen(db.sync_session, "after_commit", self._notify, once=True)
+
+    def _notify(self, *args):
+        self._wakeup.set()
+
+    def start(self):
+        if self._task is None:
+            self._stopping = False
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._stopping = True
+            self._wakeup.set()
+            await self._task
+            self._task = None
+        await self._disconnect()
+
+    async def _run(self):
+        while not self._stopping:
+            try:
+                claimed = await self.send_batch()
+            except Exception as e:
+                logger.error(f"Email outbox batch failed: {str(e)}")
+                claimed = 0
+            if claimed < self.batch_size:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                self._wakeup.clear()
+
+    async def _claim(self) -> list[OutboxEmail]:
+        now = datetime.now(timezone.utc)
+        due = (
+            select(OutboxEmail.id)
+            .where(
+                OutboxEmail.sent_at.is_(None),
+                OutboxEmail.failed_at.is_(None),
+                OutboxEmail.next_attempt_at <= now,
+            )
+            .order_by(OutboxEmail.next_attempt_at)
+            .limit(self.batch_size)
+            .with_for_update(skip_locked=True)
+        )
+        async with AsyncSessionLocal() as session, session.begin():
+            result = await session.execute(
+                update(OutboxEmail)
+                .where(OutboxEmail.id.in_(due.scalar_subquery()))
+                .values(next_attempt_at=now + CLAIM_LEASE)
+                .returning(OutboxEmail)
+                .execution_options(synchronize_session=False)
+            )
+            return list(result.scalars())
+
+    async def send_batch(self) -> int:
+        emails = await self._claim()
+        if not emails:
+            return 0
+
+        sent, failed = [], []
+        for email in emails:
+            try:
+                await self._send(email)
+                sent.append(email)
+            except Exception as e:
+                logger.error(f"Failed to send email to {email.recipient}: {str(e)}")
+                failed.append((email, str(e)))
+
+        now = datetime.now(timezone.utc)
+        changes = [{"id": email.id, "sent_at": now} for email in sent]
+        for email, error in failed:
+            attempts = email.attempts + 1
+            delay = min(self.retry_delay * 2 ** (attempts - 1), MAX_RETRY_DELAY)
+            changes.append(
+                {
+                    "id": email.id,
+                    "attempts": attempts,
+                    "last_error": error,
+                    "next_attempt_at": now + delay,
+                    "failed_at": now if attempts >= self.max_attempts else None,
+                }
+            )
+        async with AsyncSessionLocal() as session, session.begin():
+            await session.execute(update(OutboxEmail), changes)
+
+        logger.info(f"Email outbox sent {len(sent)}, failed {len(failed)}")
+        return len(emails)
+
+    async def _connect(self) -> aiosmtplib.SMTP:
+        if self._smtp is None or not self._smtp.is_connected:
+            smtp = aiosmtplib.SMTP(
+                hostname=config.EMAIL_SMTP_HOST,
+                port=config.EMAIL_SMTP_PORT,
+                use_tls=config.EMAIL_SMTP_USE_TLS,
+            )
+            await smtp.connect()
+            if config.EMAIL_LOGIN:
+                await smtp.login(config.EMAIL_LOGIN, config.EMAIL_PASSWORD)
+            self._smtp = smtp
+        return self._smtp
+
+    async def _disconnect(self):
+        if self._smtp is not None:
+            try:
+                await self._smtp.quit()
+            except aiosmtplib.SMTPException:
+                pass
+            self._smtp = None
+
+    async def _send(self, email: OutboxEmail):
+        # Create the email message
+        msg = MIMEMultipart("alternative")
+        msg["Subject"] = email.subject
+        msg["From"] = config.EMAIL_SENDER
+        msg["To"] = email.recipient
+
+        # Attach both plain text and HTML versions
+        msg.attach(MIMEText(email.text_body, "plain"))
+        if email.html_body:
+            msg.attach(MIMEText(email.html_body, "html"))
+
+        started = time.perf_counter()
+        outcome = "error"
+        try:
+            await self._deliver(msg)
+            outcome = "sent"
+        finally:
+            metrics.observe(
+                "smtp_send_duration_seconds", (outcome,), time.perf_counter() - started
+            )
+
+    async def _deliver(self, msg: MIMEMultipart):
+        try:
+            smtp = await self._connect()
+            await smtp.send_message(msg)
+        except aiosmtplib.SMTPServerDisconnected:
+            # The pooled connection went stale, reconnect once
+            self._smtp = None
+            smtp = await self._connect()
+            await smtp.send_message(msg)
+
+
+email_outbox = EmailOutbox(
+    batch_size=config.EMAIL_OUTBOX_BATCH_SIZE,
+    poll_interval=config.EMAIL_OUTBOX_POLL_SECONDS,
+    max_attempts=config.EMAIL_OUTBOX_MAX_ATTEMPTS,
+    retry_delay=config.EMAIL_OUTBOX_RETRY_SECONDS,
+)
+
+
+async def enqueue_welcome_email(db: AsyncSession, email: str, name: str):
     if not config.SEND_EMAILS:
         logger.info(f"Not sending welcome email to {email}")
         return
@@ -81,23 +270,6 @@ async def send_welcome_email(email: str, name: str):
     The {app_name} Team
     """
 
-    # Create the email message
-    msg = MIMEMultipart("alternative")
-    msg["Subject"] = subject
-    msg["From"] = config.EMAIL_SENDER
-    msg["To"] = email
-
-    # Attach both plain text and HTML versions
-    msg.attach(MIMEText(text_content, "plain"))
-    msg.attach(MIMEText(html_content, "html"))
-
-    try:
-        async with aiosmtplib.SMTP(
-            hostname="smtp.gmail.com", port=465, use_tls=True
-        ) as smtp:
-            await smtp.login(config.EMAIL_LOGIN, config.EMAIL_PASSWORD)
-            msg["From"] = config.EMAIL_SENDER
-            await smtp.send_message(msg)
-        logger.info(f"Welcome email sent successfully to {email}")
-    except Exception as e:
-        logger.error(f"Failed to send welcome email to {email}: {str(e)}")
+    # Queued in the request transaction, sent by the background outbox
+    await email_outbox.enqueue(db, email, subject, text_content, html_content)
+    logger.info(f"Welcome email queued for {email}")
@@ -16,3 +16,7 @@ class InternalServerErrorException(Exception):
 
 class TooManyRequestsException(Exception):
     pass
+
+
+class ServiceUnavailableException(Exception):
+    pass
@@ -0,0 +1,123 @@
+import asyncio
+import logging
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+
+from app import config
+from app.exceptions import ServiceUnavailableException
+from app.metrics import metrics
+from passlib.context import CryptContext
+
+logger = logging.getLogger(__name__)
+
+# Password hashing context
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+
+
+# Module level so they can be pickled into a process pool
+def _timed_hash(password: str) -> tuple[str, float]:
+    started = time.perf_counter()
+    return pwd_context.hash(password), time.perf_counter() - started
+
+
+def _timed_verify(plain_password: str, hashed_password: str) -> tuple[bool, float]:
+    started = time.perf_counter()
+    return (
+        pwd_context.verify(plain_password, hashed_password),
+        time.perf_counter() - started,
+    )
+
+
+class PasswordHasher:
+    def __init__(self, executor_type: str, max_workers: int, max_pending: int):
+        if executor_type not in ("thread", "process"):
+            raise ValueError(f"Unknown password hash executor: {executor_type}")
+        self.executor_type = executor_type
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self._executor: Executor | None = None
+
+        # Only touched from the event loop thread, so no locking is needed
+        self.pending = 0
+        self.completed = 0
+        self.rejected = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        self.total_work = 0.0
+
+    def _get_executor(self) -> Executor:
+        if self._executor is None:
+            if self.executor_type == "process":
+                self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+            else:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.max_workers, thread_name_prefix="bcrypt"
+                )
+        return self._executor
+
+    async def _submit(self, fn, *args):
+        if self.pending >= self.max_pending:
+            self.rejected += 1
+            logger.warning(
+                f"Password hash queue is full ({self.pending} pending), rejecting"
+            )
+            raise ServiceUnavailableException("Server is busy, please try again")
+
+        self.pending += 1
+        submitted = time.perf_counter()
+        try:
+            loop = asyncio.get_running_loop()
+            result, work = await loop.run_in_executor(self._get_executor(), fn, *args)
+        finally:
+            self.pending -= 1
+
+        # Whatever the worker did not spend hashing was spent waiting in the queue
+        wait = max(time.perf_counter() - submitted - work, 0.0)
+        self.completed += 1
+        self.total_wait += wait
+        self.max_wait = max(self.max_wait, wait)
+        self.total_work += work
+        metrics.observe("password_hash_wait_seconds", (), wait)
+        return result
+
+    async def hash(self, password: str) -> str:
+        return await self._submit(_timed_hash, password)
+
+    async def verify(self, plain_password: str, hashed_password: str) -> bool:
+        return await self._submit(_timed_verify, plain_password, hashed_password)
+
+    def stats(self) -> dict:
+        return {
+            "executor": self.executor_type,
+            "workers": self.max_workers,
+            "queue_depth": self.pending,
+            "queue_limit": self.max_pending,
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "avg_wait_seconds": self.total_wait / self.completed
+            if self.completed
+            else 0.0,
+            "max_wait_seconds": self.max_wait,
+            "avg_hash_seconds": self.total_work / self.completed
+            if self.completed
+            else 0.0,
+        }
+
+    def collect_metrics(self):
+        metrics.set("password_hash_queue_depth", (), self.pending)
+        metrics.set("password_hash_queue_limit", (), self.max_pending)
+        metrics.set("password_hash_rejected_total", (), self.rejected)
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+password_hasher = PasswordHasher(
+    executor_type=config.PASSWORD_HASH_EXECUTOR,
+    max_workers=config.PASSWORD_HASH_WORKERS,
+    max_pending=config.PASSWORD_HASH_MAX_PENDING,
+)
+
+metrics.add_collector(password_hasher.collect_metrics)
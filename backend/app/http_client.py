@@ -0,0 +1,93 @@
+import asyncio
+import logging
+import time
+from urllib.parse import urlsplit
+
+import httpx
+from app import config
+from app.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# Failures where the request never reached the upstream, safe to retry always
+CONNECT_ERRORS = (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)
+# Failures that are only safe to retry for idempotent requests
+TRANSIENT_ERRORS = (httpx.ReadTimeout, httpx.RemoteProtocolError)
+TRANSIENT_STATUS_CODES = (502, 503, 504)
+IDEMPOTENT_METHODS = ("GET", "HEAD", "OPTIONS")
+
+
+class HttpClient:
+    def __init__(self, retries: int):
+        self.retries = retries
+        self._client: httpx.AsyncClient | None = None
+
+    def _get_client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                limits=httpx.Limits(
+                    max_connections=config.HTTP_MAX_CONNECTIONS,
+                    max_keepalive_connections=config.HTTP_MAX_KEEPALIVE_CONNECTIONS,
+                    keepalive_expiry=config.HTTP_KEEPALIVE_SECONDS,
+                ),
+                timeout=httpx.Timeout(
+                    config.HTTP_READ_TIMEOUT_SECONDS,
+                    connect=config.HTTP_CONNECT_TIMEOUT_SECONDS,
+                ),
+            )
+        return self._client
+
+    async def start(self):
+        self._get_client()
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def request(self, method: str, url: str, **kwargs) -> httpx.Response:
+        host = urlsplit(url).netloc
+        labels = (host,)
+        idempotent = method.upper() in IDEMPOTENT_METHODS
+        client = self._get_client()
+
+        attempt = 0
+        while True:
+            started = time.perf_counter()
+            try:
+                response = await client.request(method, url, **kwargs)
+            except (CONNECT_ERRORS + TRANSIENT_ERRORS) as e:
+                metrics.inc("http_client_errors_total", labels)
+                retryable = isinstance(e, CONNECT_ERRORS) or idempotent
+                if not retryable or attempt >= self.retries:
+                    raise
+                logger.warning(f"Retrying {method} {host} after {type(e).__name__}")
+            else:
+                if (
+                    response.status_code not in TRANSIENT_STATUS_CODES
+                    or not idempotent
+                    or attempt >= self.retries
+                ):
+                    return response
+                metrics.inc("http_client_errors_total", labels)
+                logger.warning(f"Retrying {method} {host} after {response.status_code}")
+            finally:
+                metrics.observe(
+                    "http_client_request_duration_seconds",
+                    labels,
+                    time.perf_counter() - started,
+                )
+
+            attempt += 1
+            metrics.inc("http_client_retries_total", labels)
+            await asyncio.sleep(0.1 * 2**attempt)
+
+    async def get(self, url: str, **kwargs) -> httpx.Response:
+        return await self.request("GET", url, **kwargs)
+
+    async def post(self, url: str, **kwargs) -> httpx.Response:
+        return await self.request("POST", url, **kwargs)
+
+
+# Application-scoped client, opened on startup and closed on shutdown
+http_client = HttpClient(retries=config.HTTP_RETRIES)
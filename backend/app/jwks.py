@@ -0,0 +1,94 @@
+import asyncio
+import logging
+import re
+import time
+from typing import Union
+
+import httpx
+from app.exceptions import ServiceUnavailableException, UnauthorizedException
+from app.http_client import http_client
+from jose import jwk
+from jose.backends.base import Key
+
+logger = logging.getLogger(__name__)
+
+MAX_AGE_PATTERN = re.compile(r"max-age=(\d+)")
+
+
+def _max_age(response: httpx.Response, default: float) -> float:
+    match = MAX_AGE_PATTERN.search(response.headers.get("cache-control", ""))
+    return float(match.group(1)) if match else default
+
+
+# Public keys from a JWKS endpoint, parsed once and indexed by kid. Refetched
+# when the Cache-Control max-age runs out or an unknown kid shows up, but an
+# unknown kid triggers at most one fetch per min_refresh_interval.
+class JWKSCache:
+    def __init__(
+        self,
+        url: str,
+        algorithm: str,
+        default_max_age: float = 3600,
+        min_refresh_interval: float = 60,
+    ):
+        self.url = url
+        self.algorithm = algorithm
+        self.default_max_age = default_max_age
+        self.min_refresh_interval = min_refresh_interval
+        self.keys: dict[str, Key] = {}
+        self.expires_at = 0.0
+        self.fetched_at = float("-inf")
+        self._lock = asyncio.Lock()
+
+    def _cached(self, kid: str) -> Union[Key, None]:
+        if time.monotonic() < self.expires_at:
+            return self.keys.get(kid)
+        return None
+
+    async def get_key(self, kid: Union[str, None]) -> Key:
+        # The kid comes from an unverified header, anything but a string is
+        # forged and would not even be hashable
+        if not isinstance(kid, str):
+            raise UnauthorizedException("Invalid signing key")
+        key = self._cached(kid)
+        if key is not None:
+            return key
+
+        async with self._lock:
+            # Another request may have refreshed the keys while we waited
+            key = self._cached(kid)
+            if key is not None:
+                return key
+            now = time.monotonic()
+            if now >= self.expires_at or (
+                now - self.fetched_at >= self.min_refresh_interval
+            ):
+                await self._fetch()
+
+        key = self.keys.get(kid)
+        if key is None:
+            raise UnauthorizedException("Unknown signing key")
+        return key
+
+    async def _fetch(self):
+        try:
+            response = await http_client.get(self.url)
+            response.raise_for_status()
+            keys = {
+                data["kid"]: jwk.construct(data, data.get("alg", self.algorithm))
+                for data in response.json()["keys"]
+                if "kid" in data
+            }
+        except (httpx.HTTPError, KeyError, ValueError) as e:
+            if not self.keys:
+                logger.error(f"Failed to fetch signing keys from {self.url}: {e}")
+                raise ServiceUnavailableException("Signing keys are unavailable")
+            # Keep serving the keys we have rather than failing every login
+            logger.warning(f"Failed to refresh signing keys from {self.url}: {e}")
+            self.fetched_at = time.monotonic()
+            self.expires_at = self.fetched_at + self.min_refresh_interval
+            return
+
+        self.keys = keys
+        self.fetched_at = time.monotonic()
+        self.expires_at = self.fetched_at + _max_age(response, self.default_max_age)
@@ -0,0 +1,174 @@
+import logging
+import queue
+import random
+import sys
+import time
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+
+import orjson
+from app import config
+from app.metrics import metrics
+
+# Attributes every LogRecord has, anything else was passed through `extra`
+_RECORD_ATTRIBUTES = set(vars(logging.makeLogRecord({}))) | {"message", "asctime"}
+# How long shutdown waits for the writer to make room for the stop sentinel
+STOP_TIMEOUT_SECONDS = 5
+
+
+class JSONFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": datetime.fromtimestamp(record.created, tz=timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRIBUTES:
+                entry[key] = value
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return orjson.dumps(entry, default=str).decode()
+
+
+# Runs on the caller's thread, so it only enqueues: message formatting and
+# I/O happen on the listener thread. When the writer falls behind records are
+# dropped rather than blocking the event loop.
+class NonBlockingQueueHandler(QueueHandler):
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # The default formats the message here; the listener formats instead
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+# The stock listener enqueues its stop sentinel with put_nowait, which raises
+# queue.Full when a flood filled the queue right before shutdown
+class DrainingQueueListener(QueueListener):
+    def enqueue_sentinel(self):
+        self.queue.put(self._sentinel, timeout=STOP_TIMEOUT_SECONDS)
+
+
+class _Bucket:
+    __slots__ = ("second", "count", "suppressed")
+
+    def __init__(self):
+        self.second = 0
+        self.count = 0
+        self.suppressed = 0
+
+
+# Caps and samples records that carry a `sample_key` (the exception type for
+# request errors), so a flood of 401s or 429s costs a few lines per second.
+# The next record that gets through reports how many were suppressed.
+class SamplingFilter(logging.Filter):
+    def __init__(self, rules: dict, default_max_per_second: int):
+        super().__init__()
+        self.rules = rules
+        self.default_max_per_second = default_max_per_second
+        self._buckets: dict[str, _Bucket] = {}
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        key = getattr(record, "sample_key", None)
+        if key is None:
+            return True
+        rule = self.rules.get(key, {})
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = _Bucket()
+
+        second = int(time.monotonic())
+        if bucket.second != second:
+            bucket.second = second
+            bucket.count = 0
+        if bucket.count >= rule.get(
+            "max_per_second", self.default_max_per_second
+        ) or random.random() >= rule.get("sample_rate", 1.0):
+            bucket.suppressed += 1
+            return False
+
+        bucket.count += 1
+        if bucket.suppressed:
+            record.suppressed = bucket.suppressed
+            bucket.suppressed = 0
+        return True
+
+
+_listener: QueueListener | None = None
+_handler: NonBlockingQueueHandler | None = None
+
+
+def _collect_metrics():
+    if _handler is not None:
+        metrics.set("log_records_dropped_total", (), _handler.dropped)
+
+
+metrics.add_collector(_collect_metrics)
+
+
+def setup_logging():
+    global _listener, _handler
+    if _listener is not None:
+        return
+
+    writer = logging.StreamHandler(sys.stdout)
+    if config.LOG_FORMAT == "json":
+        writer.setFormatter(JSONFormatter())
+    else:
+        writer.setFormatter(logging.Formatter("%(levelname)s: %(name)s - %(message)s"))
+
+    handler = NonBlockingQueueHandler(queue.Queue(maxsize=config.LOG_QUEUE_SIZE))
+    handler.addFilter(
+        SamplingFilter(
+            rules=config.LOG_SAMPLING,
+            default_max_per_second=config.LOG_SAMPLE_MAX_PER_SECOND,
+        )
+    )
+
+    root = logging.getLogger()
+    root.handlers = [handler]
+    root.setLevel(logging.INFO if config.DEBUG else logging.WARNING)
+
+    _handler = handler
+    _listener = DrainingQueueListener(
+        handler.queue, writer, respect_handler_level=True
+    )
+    _listener.start()
+
+
+# Flushes whatever is still queued and reports the records dropped on the way
+def stop_logging():
+    global _listener
+    if _listener is None:
+        return
+    listener, _listener = _listener, None
+    try:
+        listener.stop()
+    except queue.Full:
+        # The writer made no progress, e.g. stdout is blocked. Its daemon
+        # thread is left behind rather than holding up shutdown.
+        sys.stderr.write(
+            f"Log writer is stuck, abandoning {listener.queue.qsize()} queued "
+            f"records and {_handler.dropped} dropped ones\n"
+        )
+        return
+    if _handler.dropped:
+        record = logging.makeLogRecord(
+            {
+                "name": __name__,
+                "levelno": logging.WARNING,
+                "levelname": "WARNING",
+                "msg": f"Dropped {_handler.dropped} log records, the queue was full",
+            }
+        )
+        for writer in listener.handlers:
+            writer.handle(record)
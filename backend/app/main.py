@@ -1,29 +1,43 @@
 import asyncio
 import logging
-import sys
 from datetime import timedelta
 
 from app import config
+from app.activity import activity_recorder
+from app.api.middleware import MetricsMiddleware
 from app.api.routers import (
+    admin,
+    health,
     users,
+    well_known,
 )
-from app.api.security import clear_rate_limit_store
+from app.api.routers import metrics as metrics_router
+from app.api.security import clear_rate_limit_store, rate_limit_backend
 from app.auth import (
     ACCESS_TOKEN_EXPIRE_MINUTES,
     authenticate_user,
     create_access_token,
 )
-from app.database.engine import get_db, init_db
+from app.database.engine import create_tables, get_db
+from app.email import email_outbox
 from app.exceptions import (
     BadRequestException,
     InternalServerErrorException,
     NotFoundException,
+    ServiceUnavailableException,
     TooManyRequestsException,
     UnauthorizedException,
 )
+from app.hashing import password_hasher
+from app.http_client import http_client
+from app.log import setup_logging, stop_logging
+from app.maintenance import purge_expired_refresh_tokens, purge_expired_revocations
+from app.metrics import metrics
+from app.revocation import token_revocations
+from app.startup import warm_up
 from fastapi import APIRouter, Depends, FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, ORJSONResponse
 from fastapi.security import OAuth2PasswordRequestForm
 from sqlalchemy.exc import SQLAlchemyError
 from sqlalchemy.ext.asyncio import AsyncSession
@@ -31,15 +45,10 @@ from sqlalchemy.ext.asyncio import AsyncSession
 logger = logging.getLogger(__name__)
 
 
-init_db()
-# Configure logging to output to stdout
-logging.basicConfig(
-    level=logging.INFO if config.DEBUG else logging.WARNING,
-    format="%(levelname)s: %(name)s - %(message)s",
-    handlers=[logging.StreamHandler(sys.stdout)],
-)
+# Log records are written to stdout by a background thread
+setup_logging()
 
-app = FastAPI(title="Phonetica API")
+app = FastAPI(title="Phonetica API", default_response_class=ORJSONResponse)
 
 app.add_middleware(
     CORSMiddleware,
@@ -48,40 +57,104 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+if config.METRICS_ENABLED or config.SQL_PROFILER_ENABLED:
+    app.add_middleware(
+        MetricsMiddleware,
+        record=config.METRICS_ENABLED,
+        profile=config.SQL_PROFILER_ENABLED,
+    )
 
 
 async def every_10_minute_tasks():
     while True:
         await clear_rate_limit_store()
+        try:
+            await purge_expired_refresh_tokens()
+        except Exception as e:
+            logger.error(f"Refresh token purge failed: {str(e)}")
+        try:
+            await purge_expired_revocations()
+        except Exception as e:
+            logger.error(f"Revoked token purge failed: {str(e)}")
         await asyncio.sleep(10 * 60)  # 10 minutes
 
 
 @app.on_event("startup")
 async def startup_event():
+    if config.DB_CREATE_TABLES:
+        await create_tables()
+    await http_client.start()
+    if config.STARTUP_WARMUP:
+        await warm_up()
     asyncio.create_task(every_10_minute_tasks())
+    activity_recorder.start()
+    try:
+        await token_revocations.sync()
+    except Exception as e:
+        # Retried by the sync loop
+        logger.error(f"Failed to load revoked tokens: {str(e)}")
+    token_revocations.start()
+    if config.SEND_EMAILS:
+        email_outbox.start()
+    if config.METRICS_ENABLED:
+        metrics.start()
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    password_hasher.shutdown()
+    await rate_limit_backend.close()
+    await email_outbox.stop()
+    await activity_recorder.stop()
+    await token_revocations.stop()
+    await http_client.close()
+    if config.METRICS_ENABLED:
+        metrics.stop()
+    stop_logging()
 
 
 api = APIRouter(prefix="/api")
 api.include_router(users.router, tags=["Users"])
+api.include_router(admin.router, tags=["Admin"])
 
 app.include_router(api)
+app.include_router(health.router, tags=["System"])
+app.include_router(well_known.router, tags=["System"])
+if config.METRICS_ENABLED:
+    app.include_router(metrics_router.router, tags=["System"])
+
+
+# Expected client errors log below ERROR, and the sampling filter caps each
+# exception type so floods of 401s or 429s stay cheap
+def log_request_error(level: int, request: Request, exc: Exception, **kwargs):
+    if logger.isEnabledFor(level):
+        name = type(exc).__name__
+        logger.log(
+            level,
+            "%s in %s: %s",
+            name,
+            request.url.path,
+            exc,
+            extra={"sample_key": name, "path": request.url.path},
+            **kwargs,
+        )
 
 
 @app.exception_handler(NotFoundException)
 async def not_found_exception_handler(request: Request, exc: NotFoundException):
-    logger.error(f"NotFoundException in {request.url.path}: {exc}")
+    log_request_error(logging.INFO, request, exc)
     return JSONResponse(status_code=404, content={"detail": str(exc)})
 
 
 @app.exception_handler(BadRequestException)
 async def bad_request_exception_handler(request: Request, exc: BadRequestException):
-    logger.error(f"BadRequestException in {request.url.path}: {exc}")
+    log_request_error(logging.INFO, request, exc)
     return JSONResponse(status_code=400, content={"detail": str(exc)})
 
 
 @app.exception_handler(UnauthorizedException)
 async def unauthorized_exception_handler(request: Request, exc: UnauthorizedException):
-    logger.error(f"UnauthorizedException in {request.url.path}: {exc}")
+    log_request_error(logging.WARNING, request, exc)
     return JSONResponse(status_code=401, content={"detail": str(exc)})
 
 
@@ -89,13 +162,13 @@ async def unauthorized_exception_handler(request: Request, exc: UnauthorizedExce
 async def internal_server_error_exception_handler(
     request: Request, exc: InternalServerErrorException
 ):
-    logger.error(f"InternalServerErrorException in {request.url.path}: {exc}")
+    log_request_error(logging.ERROR, request, exc)
     return JSONResponse(status_code=500, content={"detail": str(exc)})
 
 
 @app.exception_handler(SQLAlchemyError)
 async def sqlalchemy_error_handler(request: Request, exc: SQLAlchemyError):
-    logger.error(f"SQLAlchemyError in {request.url.path}: {exc}")
+    log_request_error(logging.ERROR, request, exc)
     return JSONResponse(status_code=500, content={"detail": str(exc)})
 
 
@@ -103,13 +176,23 @@ async def sqlalchemy_error_handler(request: Request, exc: SQLAlchemyError):
 async def too_many_requests_exception_handler(
     request: Request, exc: TooManyRequestsException
 ):
-    logger.error(f"TooManyRequestsException in {request.url.path}: {exc}")
+    log_request_error(logging.WARNING, request, exc)
     return JSONResponse(status_code=429, content={"detail": str(exc)})
 
 
+@app.exception_handler(ServiceUnavailableException)
+async def service_unavailable_exception_handler(
+    request: Request, exc: ServiceUnavailableException
+):
+    log_request_error(logging.WARNING, request, exc)
+    return JSONResponse(
+        status_code=503, content={"detail": str(exc)}, headers={"Retry-After": "1"}
+    )
+
+
 @app.exception_handler(Exception)
 async def exception_handler(request: Request, exc: Exception):
-    logger.error(f"Exception in {request.url.path}: {exc}")
+    log_request_error(logging.ERROR, request, exc, exc_info=exc)
     return JSONResponse(status_code=500, content={"detail": str(exc)})
 
 
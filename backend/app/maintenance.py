@@ -0,0 +1,82 @@
+import asyncio
+import logging
+import time
+
+from app import config
+from app.database.engine import engine
+from app.database.schema.revocations import RevokedToken
+from app.database.schema.tokens import RefreshToken
+from app.metrics import metrics
+from sqlalchemy import delete, func, select
+
+logger = logging.getLogger(__name__)
+
+# Advisory lock keys, one per job, shared by every worker on every node
+PURGE_REFRESH_TOKENS_LOCK = 7_300_001
+
+
+async def purge_expired_refresh_tokens(
+    batch_size: int = config.REFRESH_TOKEN_PURGE_BATCH_SIZE,
+    pause: float = config.REFRESH_TOKEN_PURGE_PAUSE_SECONDS,
+) -> int:
+    expired = (
+        select(RefreshToken.id)
+        .where(RefreshToken.expires_at < func.now())
+        .limit(batch_size)
+        .with_for_update(skip_locked=True)
+        .scalar_subquery()
+    )
+    purge = delete(RefreshToken).where(RefreshToken.id.in_(expired))
+
+    async with engine.connect() as conn:
+        # Session-level lock, released on unlock or when the connection drops
+        locked = await conn.scalar(
+            select(func.pg_try_advisory_lock(PURGE_REFRESH_TOKENS_LOCK))
+        )
+        await conn.commit()
+        if not locked:
+            logger.info("Refresh token purge is running in another worker")
+            return 0
+
+        started = time.perf_counter()
+        purged = 0
+        try:
+            while True:
+                # Short transactions keep row locks and WAL bursts small
+                result = await conn.execute(purge)
+                await conn.commit()
+                purged += result.rowcount
+                if result.rowcount < batch_size:
+                    break
+                await asyncio.sleep(pause)
+        finally:
+            # A failed batch leaves the transaction aborted, the unlock
+            # needs a fresh one
+            await conn.rollback()
+            try:
+                await conn.execute(
+                    select(func.pg_advisory_unlock(PURGE_REFRESH_TOKENS_LOCK))
+                )
+                await conn.commit()
+            except Exception as e:
+                # The pool does not release advisory locks on checkin, drop
+                # the connection so the lock goes with it
+                logger.error(f"Failed to release the purge lock: {str(e)}")
+                await conn.invalidate()
+
+    seconds = time.perf_counter() - started
+    metrics.inc("refresh_token_purged_total", (), purged)
+    metrics.observe("refresh_token_purge_duration_seconds", (), seconds)
+    logger.info(f"Purged {purged} expired refresh tokens in {seconds:.2f}s")
+    return purged
+
+
+# Small table, one statement; running it from several workers is harmless
+async def purge_expired_revocations() -> int:
+    async with engine.begin() as conn:
+        result = await conn.execute(
+            delete(RevokedToken).where(RevokedToken.expires_at < func.now())
+        )
+    if result.rowcount:
+        logger.info(f"Purged {result.rowcount} expired token revocations")
+    return result.rowcount
@@ -0,0 +1,435 @@
+import asyncio
+import bisect
+import contextlib
+import contextvars
+import json
+import logging
+import os
+import shutil
+import time
+from contextlib import contextmanager
+from typing import Callable, Union
+
+from app import config
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1,
+    2.5,
+    5,
+    10,
+)
+
+# name: (type, help, label names)
+METRICS = {
+    "http_requests_total": (
+        "counter",
+        "Requests by route and status code",
+        ("method", "route", "status"),
+    ),
+    "http_request_duration_seconds": (
+        "histogram",
+        "Request latency by route",
+        ("method", "route"),
+    ),
+    "http_request_db_queries_total": (
+        "counter",
+        "SQL statements executed while serving a route",
+        ("method", "route"),
+    ),
+    "http_request_db_seconds_total": (
+        "counter",
+        "Time spent in SQL statements while serving a route",
+        ("method", "route"),
+    ),
+    "http_request_auth_seconds_total": (
+        "counter",
+        "Time spent hashing passwords and encoding or decoding JWTs per route",
+        ("method", "route"),
+    ),
+    "db_query_duration_seconds": (
+        "histogram",
+        "SQL statement latency, including background tasks",
+        (),
+    ),
+    "auth_operation_duration_seconds": (
+        "histogram",
+        "Latency of bcrypt and JWT operations, including time queued for a worker",
+        ("operation",),
+    ),
+    "smtp_send_duration_seconds": (
+        "histogram",
+        "Time to hand one email to the SMTP server",
+        ("outcome",),
+    ),
+    "http_client_request_duration_seconds": (
+        "histogram",
+        "Outbound request latency per attempt, by upstream host",
+        ("upstream",),
+    ),
+    "http_client_errors_total": (
+        "counter",
+        "Outbound attempts that failed or got a transient status code",
+        ("upstream",),
+    ),
+    "http_client_retries_total": (
+        "counter",
+        "Outbound requests retried",
+        ("upstream",),
+    ),
+    "password_hash_queue_depth": (
+        "gauge",
+        "bcrypt operations running or waiting for a worker",
+        (),
+    ),
+    "password_hash_queue_limit": (
+        "gauge",
+        "Pending bcrypt operations allowed before answering 503",
+        (),
+    ),
+    "password_hash_rejected_total": (
+        "counter",
+        "bcrypt operations rejected with 503 because the queue was full",
+        (),
+    ),
+    "password_hash_wait_seconds": (
+        "histogram",
+        "Time a bcrypt operation waited for a worker",
+        (),
+    ),
+    "refresh_token_purged_total": (
+        "counter",
+        "Expired refresh tokens deleted by the purge job",
+        (),
+    ),
+    "refresh_token_purge_duration_seconds": (
+        "histogram",
+        "Duration of each refresh token purge this worker ran",
+        (),
+    ),
+    "log_records_dropped_total": (
+        "counter",
+        "Log records dropped because the log queue was full",
+        (),
+    ),
+    "cache_lookups_total": (
+        "counter",
+        "Cache lookups by result",
+        ("cache", "result"),
+    ),
+    "cache_evictions_total": (
+        "counter",
+        "Cache entries dropped to stay within the size limit",
+        ("cache",),
+    ),
+    "cache_entries": (
+        "gauge",
+        "Cache entries held, summed over the workers",
+        ("cache",),
+    ),
+}
+
+
+class Histogram:
+    def __init__(self, buckets: tuple):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def merge(self, counts: list, total: float):
+        for i, count in enumerate(counts):
+            self.counts[i] += count
+            self.count += count
+        self.sum += total
+
+    def cumulative(self) -> list[tuple[str, int]]:
+        result, total = [], 0
+        for bound, count in zip((*self.buckets, "+Inf"), self.counts):
+            total += count
+            result.append((str(bound), total))
+        return result
+
+    def stats(self) -> dict:
+        # Cumulative counts per upper bound, like a Prometheus histogram
+        return {"count": self.count, "sum": self.sum, "buckets": dict(self.cumulative())}
+
+
+# Values live in plain dicts that are only touched from the event loop thread,
+# so recording needs no locks. Every worker writes a snapshot to a directory of
+# its server run under METRICS_DIR and the metrics endpoint sums the snapshots
+# of that run, so earlier runs never leak in.
+class MetricsRegistry:
+    def __init__(self, directory: str, flush_interval: float):
+        self.directory = directory
+        self.run_directory = os.path.join(directory, _run_id())
+        self.flush_interval = flush_interval
+        self.counters: dict[tuple, float] = {}
+        self.histograms: dict[tuple, Histogram] = {}
+        self.gauges: dict[tuple, float] = {}
+        # Run before every snapshot to copy in values kept elsewhere
+        self._collectors: list[Callable[[], None]] = []
+        self._task: Union[asyncio.Task, None] = None
+
+    def inc(self, name: str, labels: tuple = (), value: float = 1):
+        key = (name, labels)
+        self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name: str, labels: tuple, value: float):
+        key = (name, labels)
+        histogram = self.histograms.get(key)
+        if histogram is None:
+            histogram = self.histograms[key] = Histogram(LATENCY_BUCKETS)
+        histogram.observe(value)
+
+    # For values counted elsewhere, e.g. a cache's own hit counter
+    def set(self, name: str, labels: tuple, value: float):
+        values = self.gauges if METRICS[name][0] == "gauge" else self.counters
+        values[(name, labels)] = value
+
+    def add_collector(self, collect: Callable[[], None]):
+        self._collectors.append(collect)
+
+    def snapshot(self) -> dict:
+        for collect in self._collectors:
+            collect()
+        return {
+            "counters": [
+                [name, labels, value] for (name, labels), value in self.counters.items()
+            ],
+            "gauges": [
+                [name, labels, value] for (name, labels), value in self.gauges.items()
+            ],
+            "histograms": [
+                [name, labels, list(h.counts), h.sum]
+                for (name, labels), h in self.histograms.items()
+            ],
+        }
+
+    # Safe off the event loop thread, the snapshot is a copy
+    def _write(self, snapshot: dict):
+        os.makedirs(self.run_directory, exist_ok=True)
+        path = os.path.join(self.run_directory, f"{os.getpid()}.json")
+        # Write then rename so readers never see a partial snapshot
+        with open(f"{path}.tmp", "w") as f:
+            json.dump(snapshot, f)
+        os.replace(f"{path}.tmp", path)
+
+    def dump(self):
+        self._write(self.snapshot())
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await loop.run_in_executor(None, self._write, self.snapshot())
+            except OSError as e:
+                logger.error(f"Failed to write metrics snapshot: {str(e)}")
+
+    # Runs left behind by servers that are gone, and a snapshot under this
+    # worker's pid from a previous worker that had it
+    def _remove_stale(self):
+        os.makedirs(self.directory, exist_ok=True)
+        for entry in os.scandir(self.directory):
+            if entry.path == self.run_directory:
+                continue
+            parent = entry.name.split("-", 1)[0]
+            if (
+                entry.is_dir()
+                and parent.isdigit()
+                and int(parent) != os.getppid()
+                and _alive(int(parent))
+            ):
+                # Another server sharing METRICS_DIR
+                continue
+            if entry.is_dir():
+                shutil.rmtree(entry.path, ignore_errors=True)
+            else:
+                with contextlib.suppress(OSError):
+                    os.remove(entry.path)
+        with contextlib.suppress(OSError):
+            os.remove(os.path.join(self.run_directory, f"{os.getpid()}.json"))
+
+    def start(self):
+        if self._task is None:
+            self._remove_stale()
+            self._task = asyncio.create_task(self._run())
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        self.dump()
+
+    def _load_snapshots(self) -> list[tuple[int, dict]]:
+        snapshots = []
+        for filename in os.listdir(self.run_directory):
+            if not filename.endswith(".json"):
+                continue
+            try:
+                with open(os.path.join(self.run_directory, filename)) as f:
+                    snapshots.append((int(filename[: -len(".json")]), json.load(f)))
+            except (OSError, ValueError) as e:
+                logger.warning(f"Skipping metrics snapshot {filename}: {str(e)}")
+        return snapshots
+
+    # File reads and merging run in a thread, only the snapshot of this
+    # worker is taken on the event loop
+    async def render(self) -> str:
+        snapshot = self.snapshot()
+        return await asyncio.get_running_loop().run_in_executor(
+            None, self._render, snapshot
+        )
+
+    def _render(self, snapshot: dict) -> str:
+        self._write(snapshot)
+        # Snapshots of exited workers are kept so counters never go backwards
+        counters: dict[tuple, float] = {}
+        gauges: dict[tuple, float] = {}
+        histograms: dict[tuple, Histogram] = {}
+        for pid, snapshot in self._load_snapshots():
+            for name, labels, value in snapshot["counters"]:
+                key = (name, tuple(labels))
+                counters[key] = counters.get(key, 0) + value
+            # A gauge is the current state, which an exited worker has none of
+            if not _alive(pid):
+                continue
+            for name, labels, value in snapshot.get("gauges", ()):
+                key = (name, tuple(labels))
+                gauges[key] = gauges.get(key, 0) + value
+            for name, labels, counts, total in snapshot["histograms"]:
+                key = (name, tuple(labels))
+                if key not in histograms:
+                    histograms[key] = Histogram(LATENCY_BUCKETS)
+                histograms[key].merge(counts, total)
+
+        lines = []
+        for name, (kind, help_text, label_names) in METRICS.items():
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            values = {"counter": counters, "gauge": gauges}.get(kind, histograms)
+            for (metric, labels), value in sorted(values.items()):
+                if metric != name:
+                    continue
+                pairs = list(zip(label_names, labels))
+                if kind != "histogram":
+                    lines.append(f"{name}{_labels(pairs)} {value}")
+                    continue
+                for bound, count in value.cumulative():
+                    lines.append(
+                        f"{name}_bucket{_labels(pairs + [('le', bound)])} {count}"
+                    )
+                lines.append(f"{name}_sum{_labels(pairs)} {value.sum}")
+                lines.append(f"{name}_count{_labels(pairs)} {value.count}")
+        return "\n".join(lines) + "\n"
+
+
+# Workers of one server share a parent. Its start time tells a restarted
+# server apart even when it got the same pid, e.g. in a container.
+def _run_id() -> str:
+    parent = os.getppid()
+    try:
+        with open(f"/proc/{parent}/stat") as f:
+            started = f.read().rsplit(")", 1)[1].split()[19]
+    except (OSError, IndexError):
+        return str(parent)
+    return f"{parent}-{started}"
+
+
+def _alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        # Alive, just not ours to signal
+        pass
+    return True
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(pairs: list) -> str:
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in pairs) + "}"
+
+
+metrics = MetricsRegistry(
+    directory=config.METRICS_DIR, flush_interval=config.METRICS_FLUSH_SECONDS
+)
+
+
+# Costs attributed to the request being served, see MetricsMiddleware
+class RequestStats:
+    __slots__ = ("db_queries", "db_seconds", "auth_seconds", "queries")
+
+    def __init__(self, profile: bool = False):
+        self.db_queries = 0
+        self.db_seconds = 0.0
+        self.auth_seconds = 0.0
+        # (statement, seconds, rows) per statement, only kept when profiling
+        self.queries: Union[list[tuple[str, float, int]], None] = (
+            [] if profile else None
+        )
+
+
+current_request: contextvars.ContextVar[Union[RequestStats, None]] = (
+    contextvars.ContextVar("current_request", default=None)
+)
+
+
+@contextmanager
+def auth_timer(operation: str):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        metrics.observe("auth_operation_duration_seconds", (operation,), elapsed)
+        stats = current_request.get()
+        if stats is not None:
+            stats.auth_seconds += elapsed
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    context._metrics_started = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - context._metrics_started
+    metrics.observe("db_query_duration_seconds", (), elapsed)
+    # SQLAlchemy runs the driver in a greenlet that shares the calling task's
+    # context, so this sees the request that issued the statement
+    stats = current_request.get()
+    if stats is not None:
+        stats.db_queries += 1
+        stats.db_seconds += elapsed
+        if stats.queries is not None:
+            stats.queries.append((statement, elapsed, cursor.rowcount))
+
+
+def instrument_engine(engine: AsyncEngine):
+    event.listen(engine.sync_engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine.sync_engine, "after_cursor_execute", _after_cursor_execute)
@@ -0,0 +1,54 @@
+import logging
+import re
+from collections import Counter
+
+from app import config
+from app.metrics import RequestStats
+
+logger = logging.getLogger(__name__)
+
+_WHITESPACE = re.compile(r"\s+")
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+# Not the digits of $1 style placeholders or of identifiers
+_NUMBER_LITERAL = re.compile(r"(?<![$\w])\d+(?:\.\d+)?\b")
+_PLACEHOLDER = r"\s*(?:\$\d+|%\(\w+\)s|\?)\s*"
+_PARAMETER_LIST = re.compile(rf"\((?:{_PLACEHOLDER},)+{_PLACEHOLDER}\)")
+
+
+# Statements that differ only in literals or in the length of an IN list
+# count as the same statement
+def normalize_statement(statement: str) -> str:
+    statement = _WHITESPACE.sub(" ", statement).strip()
+    statement = _STRING_LITERAL.sub("?", statement)
+    statement = _NUMBER_LITERAL.sub("?", statement)
+    return _PARAMETER_LIST.sub("(...)", statement)
+
+
+def server_timing(stats: RequestStats, total: float) -> str:
+    return (
+        f'db;dur={stats.db_seconds * 1000:.1f};desc="{stats.db_queries} queries", '
+        f"auth;dur={stats.auth_seconds * 1000:.1f}, "
+        f"total;dur={total * 1000:.1f}"
+    )
+
+
+def report(method: str, path: str, stats: RequestStats, total: float):
+    statements = [
+        (normalize_statement(statement), seconds, rows)
+        for statement, seconds, rows in stats.queries
+    ]
+    counts = Counter(statement for statement, _, _ in statements)
+    repeated = {statement: count for statement, count in counts.items() if count > 1}
+    slow = total >= config.SLOW_REQUEST_SECONDS
+    if not slow and not repeated:
+        return
+
+    lines = [
+        f"{'Slow request' if slow else 'Repeated statements in'} {method} {path}: "
+        f"{total * 1000:.1f}ms total, {stats.db_seconds * 1000:.1f}ms in "
+        f"{stats.db_queries} queries, {stats.auth_seconds * 1000:.1f}ms auth"
+    ]
+    for statement, seconds, rows in statements:
+        flag = f" [repeated x{repeated[statement]}]" if statement in repeated else ""
+        lines.append(f"  {seconds * 1000:8.1f}ms {rows:>6} rows  {statement}{flag}")
+    logger.warning("\n".join(lines))
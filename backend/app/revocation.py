@@ -0,0 +1,171 @@
+import asyncio
+import contextlib
+import logging
+import time
+from datetime import datetime, timedelta, timezone
+
+from app import config
+from app.database.engine import PrimaryReadSessionLocal
+from app.database.schema.revocations import RevokedToken
+from sqlalchemy import event, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+logger = logging.getLogger(__name__)
+
+# Session.info key for revocations waiting on their transaction
+_PENDING_KEY = "pending_revocations"
+
+
+def _datetime(timestamp: float) -> datetime:
+    return datetime.fromtimestamp(timestamp, tz=timezone.utc)
+
+
+# Revoked access tokens, held per worker so checking a token is a dict lookup
+# and never a query. Revocations are written to revoked_tokens in the
+# request's transaction and applied locally once it commits; the other
+# workers pick them up within sync_interval by reading only the rows added
+# since their last pull.
+class TokenRevocations:
+    def __init__(self, sync_interval: float, overlap: float):
+        self.sync_interval = sync_interval
+        self.overlap = overlap
+        # jti -> exp of the token
+        self._tokens: dict[str, float] = {}
+        # subject -> (tokens issued before this are revoked, row expiry)
+        self._subjects: dict[str, tuple[float, float]] = {}
+        self._synced_at: float | None = None
+        self._task: asyncio.Task | None = None
+        event.listen(Session, "after_commit", self._after_commit)
+        event.listen(Session, "after_rollback", self._after_rollback)
+
+    def __len__(self) -> int:
+        return len(self._tokens) + len(self._subjects)
+
+    def is_revoked(self, payload: dict) -> bool:
+        jti = payload.get("jti")
+        if jti is not None and jti in self._tokens:
+            return True
+        cutoff = self._subjects.get(payload.get("sub"))
+        # Tokens from before iat was added count as issued at the epoch
+        return cutoff is not None and payload.get("iat", 0) < cutoff[0]
+
+    def _add(
+        self,
+        jti: str | None,
+        subject: str | None,
+        revoked_at: float,
+        expires_at: float,
+    ):
+        if jti is not None:
+            self._tokens[jti] = expires_at
+        if subject is not None:
+            issued_before, _ = self._subjects.get(subject, (float("-inf"), 0.0))
+            if revoked_at > issued_before:
+                self._subjects[subject] = (revoked_at, expires_at)
+
+    # A failed commit must not leave this worker rejecting tokens that no
+    # other worker, or this one after a restart, would reject
+    def _add_after_commit(self, db: AsyncSession, *entry):
+        db.sync_session.info.setdefault(_PENDING_KEY, []).append(entry)
+
+    def _after_commit(self, session: Session):
+        for entry in session.info.pop(_PENDING_KEY, ()):
+            self._add(*entry)
+
+    def _after_rollback(self, session: Session):
+        session.info.pop(_PENDING_KEY, None)
+
+    def revoke_token(self, db: AsyncSession, payload: dict) -> bool:
+        jti, exp = payload.get("jti"), payload.get("exp")
+        if jti is None or exp is None:
+            # Issued before tokens had a jti, these expire on their own
+            return False
+        revoked_at = time.time()
+        db.add(
+            RevokedToken(
+                jti=jti, revoked_at=_datetime(revoked_at), expires_at=_datetime(exp)
+            )
+        )
+        self._add_after_commit(db, jti, None, revoked_at, exp)
+        return True
+
+    # Revokes every token issued to subject until now, e.g. on a password
+    # change. Kept until the longest lived token issued before it expires.
+    def revoke_subject(self, db: AsyncSession, subject: str):
+        revoked_at = time.time()
+        lifetime = timedelta(
+            days=config.REFRESH_TOKEN_EXPIRE_DAYS,
+            minutes=config.ACCESS_TOKEN_EXPIRE_MINUTES,
+        )
+        expires_at = revoked_at + lifetime.total_seconds()
+        db.add(
+            RevokedToken(
+                subject=subject,
+                revoked_at=_datetime(revoked_at),
+                expires_at=_datetime(expires_at),
+            )
+        )
+        self._add_after_commit(db, None, subject, revoked_at, expires_at)
+
+    def _prune(self, now: float):
+        self._tokens = {
+            jti: expires_at
+            for jti, expires_at in self._tokens.items()
+            if expires_at > now
+        }
+        self._subjects = {
+            subject: entry
+            for subject, entry in self._subjects.items()
+            if entry[1] > now
+        }
+
+    async def sync(self) -> int:
+        started = time.time()
+        query = select(
+            RevokedToken.jti,
+            RevokedToken.subject,
+            RevokedToken.revoked_at,
+            RevokedToken.expires_at,
+        )
+        if self._synced_at is None:
+            # Everything still in force
+            query = query.where(RevokedToken.expires_at > _datetime(started))
+        else:
+            query = query.where(
+                RevokedToken.revoked_at >= _datetime(self._synced_at - self.overlap)
+            )
+        # The primary, replica lag would delay revocations
+        async with PrimaryReadSessionLocal() as session:
+            rows = (await session.execute(query)).all()
+
+        for jti, subject, revoked_at, expires_at in rows:
+            self._add(jti, subject, revoked_at.timestamp(), expires_at.timestamp())
+        self._prune(started)
+        self._synced_at = started
+        return len(rows)
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.sync_interval)
+            try:
+                await self.sync()
+            except Exception as e:
+                logger.error(f"Failed to sync revoked tokens: {str(e)}")
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._task
+            self._task = None
+
+
+token_revocations = TokenRevocations(
+    sync_interval=config.TOKEN_REVOCATION_SYNC_SECONDS,
+    overlap=config.TOKEN_REVOCATION_SYNC_OVERLAP_SECONDS,
+)
@@ -0,0 +1,183 @@
+import logging
+import os
+import time
+from typing import Union
+
+from app import config
+from jose import JWTError, jwk, jwt
+from jose.backends.base import Key
+
+logger = logging.getLogger(__name__)
+
+ASYMMETRIC_ALGORITHMS = ("RS256", "RS384", "RS512", "ES256", "ES384", "ES512")
+PRIVATE_KEY_SUFFIX = ".pem"
+# Verification-only keys, e.g. a retired key whose tokens have not expired yet
+PUBLIC_KEY_SUFFIX = ".pub.pem"
+
+
+class SigningKey:
+    def __init__(self, kid: str, key: Key, public_key: Key, can_sign: bool):
+        self.kid = kid
+        self.key = key
+        self.public_key = public_key
+        self.can_sign = can_sign
+
+
+# Signing keys loaded from JWT_KEYS_DIR, one PEM file per key named after its
+# kid. Every key in the directory verifies tokens and is published in the JWKS;
+# new tokens are signed with JWT_SIGNING_KID, or the newest private key. The
+# directory is rescanned at most every JWT_KEYS_RELOAD_SECONDS, so keys can be
+# rotated without a redeploy: publish the new key, wait for downstream caches,
+# make it the newest, and remove the old one once its tokens have expired.
+class KeyRing:
+    def __init__(
+        self,
+        directory: str,
+        algorithm: str,
+        reload_interval: float,
+        legacy_algorithm: Union[str, None] = None,
+        legacy_switched_at: Union[float, None] = None,
+        legacy_lifetime: float = 0,
+    ):
+        self.directory = directory
+        self.algorithm = algorithm
+        self.reload_interval = reload_interval
+        self.legacy_algorithm = legacy_algorithm
+        self.legacy_switched_at = legacy_switched_at
+        # No SECRET_KEY token issued before the switch outlives this
+        self.legacy_until = (
+            legacy_switched_at + legacy_lifetime
+            if legacy_switched_at is not None
+            else float("-inf")
+        )
+        self.keys: dict[str, SigningKey] = {}
+        self.active: Union[SigningKey, None] = None
+        # Bumped on every change so cached verifications can be keyed on it
+        self.version = 0
+        self._jwks: dict = {"keys": []}
+        self._snapshot = None
+        self._checked_at = float("-inf")
+        # Fail at startup rather than on the first login
+        self.refresh()
+
+    def _load(self):
+        keys, newest, newest_mtime = {}, None, float("-inf")
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith(PUBLIC_KEY_SUFFIX):
+                kid, can_sign = entry.name[: -len(PUBLIC_KEY_SUFFIX)], False
+            elif entry.name.endswith(PRIVATE_KEY_SUFFIX):
+                kid, can_sign = entry.name[: -len(PRIVATE_KEY_SUFFIX)], True
+            else:
+                continue
+            with open(entry.path) as f:
+                key = jwk.construct(f.read(), self.algorithm)
+            public_key = key.public_key() if can_sign else key
+            keys[kid] = SigningKey(kid, key, public_key, can_sign)
+            mtime = entry.stat().st_mtime
+            if can_sign and mtime > newest_mtime:
+                newest, newest_mtime = kid, mtime
+
+        active = keys.get(config.JWT_SIGNING_KID or newest)
+        if active is None or not active.can_sign:
+            raise RuntimeError(f"No private signing key found in {self.directory}")
+
+        self.keys = keys
+        self.active = active
+        self.version += 1
+        self._jwks = {
+            "keys": [
+                {
+                    **signing_key.public_key.to_dict(),
+                    "kid": signing_key.kid,
+                    "alg": self.algorithm,
+                    "use": "sig",
+                }
+                for signing_key in keys.values()
+            ]
+        }
+        logger.info(f"Loaded {len(keys)} signing keys, signing with {active.kid}")
+
+    def refresh(self):
+        now = time.monotonic()
+        if now - self._checked_at < self.reload_interval:
+            return
+        self._checked_at = now
+        # Names, sizes and mtimes, which catches keys replaced in place too
+        snapshot = sorted(
+            (entry.name, entry.stat().st_mtime_ns, entry.stat().st_size)
+            for entry in os.scandir(self.directory)
+            if entry.name.endswith(PRIVATE_KEY_SUFFIX)
+        )
+        if snapshot == self._snapshot:
+            return
+        try:
+            self._load()
+            self._snapshot = snapshot
+        except (OSError, RuntimeError, JWTError) as e:
+            if self.active is None:
+                raise
+            # Keep signing with the keys we have rather than failing logins
+            logger.error(f"Failed to reload signing keys: {str(e)}")
+
+    def sign(self, claims: dict) -> str:
+        self.refresh()
+        return jwt.encode(
+            claims,
+            self.active.key,
+            algorithm=self.algorithm,
+            headers={"kid": self.active.kid},
+        )
+
+    def verify(self, token: str) -> dict:
+        self.refresh()
+        kid = jwt.get_unverified_header(token).get("kid")
+        # The header is not verified yet, anything but a string is forged
+        if kid is not None and not isinstance(kid, str):
+            raise JWTError("Invalid kid")
+        signing_key = self.keys.get(kid)
+        if signing_key is None:
+            if kid is None:
+                return self._verify_legacy(token)
+            raise JWTError("Unknown signing key")
+        return jwt.decode(token, signing_key.public_key, algorithms=[self.algorithm])
+
+    # Tokens signed with SECRET_KEY before the switch to asymmetric keys. Only
+    # those issued before it are accepted, and nothing at all once the last of
+    # them has expired, so a leaked SECRET_KEY cannot mint tokens forever.
+    def _verify_legacy(self, token: str) -> dict:
+        if not config.SECRET_KEY or time.time() >= self.legacy_until:
+            raise JWTError("Unknown signing key")
+        payload = jwt.decode(
+            token, config.SECRET_KEY, algorithms=[self.legacy_algorithm]
+        )
+        iat, exp = payload.get("iat"), payload.get("exp")
+        if not isinstance(exp, (int, float)) or exp > self.legacy_until:
+            raise JWTError("Legacy token expires after the cutoff")
+        # Tokens from before iat was added have none
+        if isinstance(iat, (int, float)) and iat > self.legacy_switched_at:
+            raise JWTError("Legacy token issued after the switch")
+        return payload
+
+    def jwks(self) -> dict:
+        self.refresh()
+        return self._jwks
+
+
+# Only set up when an asymmetric algorithm is configured, HS* tokens keep
+# using SECRET_KEY
+signing_keys = (
+    KeyRing(
+        directory=config.JWT_KEYS_DIR,
+        algorithm=config.HASH_ALGORITHM,
+        reload_interval=config.JWT_KEYS_RELOAD_SECONDS,
+        legacy_algorithm=config.JWT_LEGACY_ALGORITHM,
+        legacy_switched_at=(
+            float(config.JWT_LEGACY_SWITCHED_AT)
+            if config.JWT_LEGACY_SWITCHED_AT is not None
+            else None
+        ),
+        legacy_lifetime=config.ACCESS_TOKEN_EXPIRE_MINUTES * 60,
+    )
+    if config.HASH_ALGORITHM in ASYMMETRIC_ALGORITHMS
+    else None
+)
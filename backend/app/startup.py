@@ -0,0 +1,57 @@
+import asyncio
+import logging
+import time
+from datetime import datetime, timedelta
+
+from app import config
+from app.api.models.users import LoginResponse, Token, UserInDB
+from app.auth import create_access_token, decode_token
+from app.database.engine import engine, replica_engine, warm_pool
+from app.hashing import password_hasher
+
+logger = logging.getLogger(__name__)
+
+
+def _warm_models():
+    # Exercise validation and JSON serialization once per response model
+    token = Token(token="warmup", expires_days=1.0)
+    user = UserInDB(
+        email="warmup@example.com",
+        name="warmup",
+        timezone="UTC",
+        last_login=datetime.utcnow(),
+        has_access=False,
+    )
+    login = LoginResponse(
+        email=user.email,
+        name=user.name,
+        timezone=user.timezone,
+        last_login=user.last_login,
+        access_token=token,
+    )
+    for model in (token, user, login):
+        type(model).model_validate_json(model.model_dump_json())
+
+
+def _warm_jwt():
+    token = create_access_token({"sub": "warmup"}, expires_delta=timedelta(minutes=1))
+    decode_token(token)
+
+
+async def _warm_hashing():
+    # One hash per worker so every pool thread or process is started, within
+    # the queue limit hash() enforces
+    count = min(password_hasher.max_workers, password_hasher.max_pending)
+    await asyncio.gather(*(password_hasher.hash("warmup") for _ in range(count)))
+
+
+async def warm_up():
+    started = time.perf_counter()
+    engines = [e for e in (engine, replica_engine) if e is not None]
+    await asyncio.gather(
+        *(warm_pool(e, config.DB_POOL_WARM_CONNECTIONS) for e in engines),
+        _warm_hashing(),
+    )
+    _warm_models()
+    _warm_jwt()
+    logger.info(f"Warmed up in {time.perf_counter() - started:.2f}s")
@@ -0,0 +1,476 @@
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from datetime import datetime, timedelta
+
+sys.path.append(".")  # Add the current directory to the Python path
+
+# In-process runs measure the request path only; a remote server has to be
+# started with the same settings (and the same OAUTH_SECRET_KEY, the fixtures
+# mint their own tokens)
+os.environ.setdefault("SEND_EMAILS", "False")
+os.environ.setdefault("RATE_LIMIT_BACKEND", "memory")
+os.environ.setdefault("RATE_LIMIT", "1000000000")
+os.environ.setdefault("METRICS_DIR", tempfile.mkdtemp(prefix="load-test-metrics-"))
+
+import httpx
+from app.auth import ACCESS_TOKEN_EXPIRE_MINUTES, create_access_token, hash_refresh_token
+from app.database.engine import AsyncSessionLocal
+from app.database.schema.tokens import RefreshToken
+from app.database.schema.users import User
+from app.hashing import pwd_context
+from sqlalchemy import delete, insert, select
+
+PASSWORD = "load-test-password"
+USER_AGENT = "load-test"
+# Logins replace the refresh token of their device, keep them off the one the
+# refresh scenario uses
+LOGIN_USER_AGENT = "load-test-login"
+
+# Share of each endpoint in the "mixed" scenario, roughly what a logged in
+# frontend produces: mostly whoami and refresh, few password checks
+MIX = {
+    "whoami": 60,
+    "refresh": 20,
+    "login": 8,
+    "token": 4,
+    "signup": 4,
+    "logout": 4,
+}
+
+
+class Fixtures:
+    def __init__(self, run_id: str, users: list[dict], sessions: list[dict]):
+        self.run_id = run_id
+        self.users = users
+        # Each logout consumes a session
+        self.sessions = sessions
+        self.signups = 0
+
+    def user(self) -> dict:
+        return random.choice(self.users)
+
+
+async def seed(users: int, sessions: int) -> Fixtures:
+    # Hashing once and inserting directly keeps setup out of the measurements
+    run_id = uuid.uuid4().hex[:8]
+    password_hash = pwd_context.hash(PASSWORD)
+    now = datetime.utcnow()
+    async with AsyncSessionLocal() as db:
+        result = await db.execute(
+            insert(User)
+            .values(
+                [
+                    {
+                        "email": f"load-{run_id}-{i}@example.com",
+                        "name": f"Load {i}",
+                        "password_hash": password_hash,
+                        "timezone": "UTC",
+                        "created_at": now,
+                        "last_login": now,
+                        "last_active": now,
+                        "has_access": False,
+                    }
+                    for i in range(users)
+                ]
+            )
+            .returning(User.id, User.email)
+        )
+        seeded = []
+        for user_id, email in result.all():
+            seeded.append(
+                {
+                    "id": user_id,
+                    "email": email,
+                    "access_token": create_access_token(
+                        {"sub": email},
+                        expires_delta=timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES),
+                    ),
+                    "refresh_token": create_access_token(
+                        {"sub": email}, expires_delta=timedelta(days=1)
+                    ),
+                }
+            )
+
+        tokens, session_fixtures = [], []
+        for user in seeded:
+            tokens.append(
+                {
+                    "user_id": user["id"],
+                    "token_hash": hash_refresh_token(user["refresh_token"]),
+                    "device_info": USER_AGENT,
+                    "issued_at": now,
+                    "expires_at": now + timedelta(days=1),
+                }
+            )
+        for i in range(sessions):
+            user = seeded[i % len(seeded)]
+            device = f"{USER_AGENT}-session-{i}"
+            tokens.append(
+                {
+                    "user_id": user["id"],
+                    "token_hash": hash_refresh_token(f"{run_id}-{i}"),
+                    "device_info": device,
+                    "issued_at": now,
+                    "expires_at": now + timedelta(days=1),
+                }
+            )
+            # Its own access token, logging out revokes it
+            access_token = create_access_token(
+                {"sub": user["email"]},
+                expires_delta=timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES),
+            )
+            session_fixtures.append(
+                {**user, "device": device, "access_token": access_token}
+            )
+        await db.execute(insert(RefreshToken), tokens)
+        await db.commit()
+    random.shuffle(session_fixtures)
+    return Fixtures(run_id, seeded, session_fixtures)
+
+
+async def cleanup(fixtures: Fixtures):
+    async with AsyncSessionLocal() as db:
+        users = User.email.like(f"load-{fixtures.run_id}-%")
+        await db.execute(
+            delete(RefreshToken).where(
+                RefreshToken.user_id.in_(select(User.id).where(users))
+            )
+        )
+        await db.execute(delete(User).where(users))
+        await db.commit()
+
+
+async def do_token(client: httpx.AsyncClient, fixtures: Fixtures) -> httpx.Response:
+    return await client.post(
+        "/token", data={"username": fixtures.user()["email"], "password": PASSWORD}
+    )
+
+
+async def do_login(client: httpx.AsyncClient, fixtures: Fixtures) -> httpx.Response:
+    return await client.post(
+        "/api/users/login",
+        json={"email": fixtures.user()["email"], "password": PASSWORD},
+        headers={"x-timezone": "UTC", "user-agent": LOGIN_USER_AGENT},
+    )
+
+
+async def do_refresh(client: httpx.AsyncClient, fixtures: Fixtures) -> httpx.Response:
+    token = fixtures.user()["refresh_token"]
+    return await client.get(
+        "/api/users/refresh", headers={"cookie": f"refreshToken={token}"}
+    )
+
+
+async def do_whoami(client: httpx.AsyncClient, fixtures: Fixtures) -> httpx.Response:
+    token = fixtures.user()["access_token"]
+    return await client.get(
+        "/api/users/whoami", headers={"authorization": f"Bearer {token}"}
+    )
+
+
+async def do_signup(client: httpx.AsyncClient, fixtures: Fixtures) -> httpx.Response:
+    fixtures.signups += 1
+    return await client.post(
+        "/api/users/signup",
+        json={
+            "email": f"load-{fixtures.run_id}-signup-{fixtures.signups}@example.com",
+            "name": "Load",
+            "password": PASSWORD,
+        },
+        headers={"x-timezone": "UTC", "user-agent": USER_AGENT},
+    )
+
+
+async def do_logout(client: httpx.AsyncClient, fixtures: Fixtures) -> httpx.Response:
+    if not fixtures.sessions:
+        raise RuntimeError("Out of sessions to log out, raise --sessions")
+    session = fixtures.sessions.pop()
+    return await client.post(
+        "/api/users/logout",
+        headers={
+            "authorization": f"Bearer {session['access_token']}",
+            "user-agent": session["device"],
+        },
+    )
+
+
+SCENARIOS = {
+    "token": do_token,
+    "login": do_login,
+    "refresh": do_refresh,
+    "whoami": do_whoami,
+    "signup": do_signup,
+    "logout": do_logout,
+}
+
+
+async def do_mixed(client: httpx.AsyncClient, fixtures: Fixtures) -> httpx.Response:
+    name = random.choices(list(MIX), weights=list(MIX.values()))[0]
+    return await SCENARIOS[name](client, fixtures)
+
+
+SCENARIOS["mixed"] = do_mixed
+
+
+def parse_metrics(text: str) -> dict:
+    totals = {}
+    for line in text.splitlines():
+        if line.startswith("#") or not line:
+            continue
+        series, value = line.rsplit(" ", 1)
+        name = series.split("{", 1)[0]
+        totals[name] = totals.get(name, 0.0) + float(value)
+    return totals
+
+
+async def scrape(client: httpx.AsyncClient) -> dict | None:
+    response = await client.get("/metrics")
+    if response.status_code != 200:
+        return None
+    return parse_metrics(response.text)
+
+
+def rss_mb(pids: list[int]) -> float | None:
+    total = 0
+    for pid in pids:
+        try:
+            with open(f"/proc/{pid}/status") as f:
+                for line in f:
+                    if line.startswith("VmRSS:"):
+                        total += int(line.split()[1])
+        except OSError:
+            return None
+    return total / 1024
+
+
+async def run_level(
+    client: httpx.AsyncClient,
+    fixtures: Fixtures,
+    scenario: str,
+    concurrency: int,
+    duration: float,
+    settle: float,
+    pids: list[int],
+) -> dict:
+    operation = SCENARIOS[scenario]
+    latencies, errors = [], 0
+    before = await scrape(client)
+    started = time.perf_counter()
+    deadline = started + duration
+
+    async def worker():
+        nonlocal errors
+        while time.perf_counter() < deadline:
+            request_started = time.perf_counter()
+            response = await operation(client, fixtures)
+            latencies.append(time.perf_counter() - request_started)
+            if response.status_code >= 400:
+                errors += 1
+
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    # Other workers publish their metrics every METRICS_FLUSH_SECONDS
+    await asyncio.sleep(settle)
+    after = await scrape(client)
+    queries = None
+    if before is not None and after is not None:
+        requests = after.get("http_requests_total", 0) - before.get(
+            "http_requests_total", 0
+        )
+        # The first scrape is itself a request
+        requests -= 1
+        executed = after.get("http_request_db_queries_total", 0) - before.get(
+            "http_request_db_queries_total", 0
+        )
+        queries = executed / requests if requests > 0 else None
+
+    percentiles = statistics.quantiles(latencies, n=100) if len(latencies) > 1 else []
+    return {
+        "scenario": scenario,
+        "concurrency": concurrency,
+        "requests": len(latencies),
+        "errors": errors,
+        "duration_seconds": elapsed,
+        "throughput_rps": len(latencies) / elapsed,
+        "latency_ms": {
+            "p50": percentiles[49] * 1000 if percentiles else None,
+            "p95": percentiles[94] * 1000 if percentiles else None,
+            "p99": percentiles[98] * 1000 if percentiles else None,
+            "mean": statistics.fmean(latencies) * 1000 if latencies else None,
+            "max": max(latencies) * 1000 if latencies else None,
+        },
+        "db_queries_per_request": queries,
+        "rss_mb": rss_mb(pids),
+    }
+
+
+async def run(args) -> list[dict]:
+    if args.url:
+        client = httpx.AsyncClient(base_url=args.url, timeout=60)
+        startup = shutdown = None
+        pids = args.pid
+    else:
+        from app.main import app
+
+        client = httpx.AsyncClient(
+            transport=httpx.ASGITransport(app=app), base_url="http://load-test"
+        )
+        startup, shutdown = app.router.startup, app.router.shutdown
+        pids = [os.getpid()]
+
+    if startup is not None:
+        await startup()
+    fixtures = await seed(args.users, args.sessions)
+    results = []
+    try:
+        for scenario in args.scenarios:
+            for concurrency in args.concurrency:
+                # Unmeasured warm-up so caches and pools are in steady state
+                await run_level(
+                    client, fixtures, scenario, concurrency, args.warmup, 0, pids
+                )
+                result = await run_level(
+                    client,
+                    fixtures,
+                    scenario,
+                    concurrency,
+                    args.duration,
+                    args.settle,
+                    pids,
+                )
+                results.append(result)
+                print_result(result)
+    finally:
+        await cleanup(fixtures)
+        await client.aclose()
+        if shutdown is not None:
+            await shutdown()
+    return results
+
+
+def _format(value, spec: str) -> str:
+    return "-" if value is None else format(value, spec)
+
+
+def print_result(result: dict):
+    latency = result["latency_ms"]
+    print(
+        f"{result['scenario']:>8} c={result['concurrency']:<4}"
+        f"{_format(result['throughput_rps'], '9.1f')} req/s  "
+        f"p50 {_format(latency['p50'], '7.1f')}ms  "
+        f"p95 {_format(latency['p95'], '7.1f')}ms  "
+        f"p99 {_format(latency['p99'], '7.1f')}ms  "
+        f"{_format(result['db_queries_per_request'], '4.2f')} q/req  "
+        f"rss {_format(result['rss_mb'], '6.1f')}MB  "
+        f"errors {result['errors']}"
+    )
+
+
+def git_commit() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+# A result regresses when throughput drops or p95 latency grows by more than
+# the tolerance relative to the baseline
+def compare(baseline: dict, results: list[dict], tolerance: float) -> bool:
+    previous = {
+        (r["scenario"], r["concurrency"]): r for r in baseline.get("results", [])
+    }
+    regressed = False
+    for result in results:
+        old = previous.get((result["scenario"], result["concurrency"]))
+        if old is None:
+            continue
+        throughput = result["throughput_rps"] / old["throughput_rps"] - 1
+        p95 = result["latency_ms"]["p95"] / old["latency_ms"]["p95"] - 1
+        failed = throughput < -tolerance or p95 > tolerance
+        regressed = regressed or failed
+        print(
+            f"{result['scenario']:>8} c={result['concurrency']:<4}"
+            f"throughput {throughput:+7.1%}  p95 {p95:+7.1%}"
+            f"{'  REGRESSED' if failed else ''}"
+        )
+    return regressed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Load test the auth endpoints against DATABASE_URL."
+    )
+    parser.add_argument(
+        "--url", help="Base URL of a running server, defaults to the app in-process"
+    )
+    parser.add_argument(
+        "--pid",
+        type=int,
+        action="append",
+        default=[],
+        help="Server process to report RSS for, repeat for each worker",
+    )
+    parser.add_argument(
+        "--scenarios",
+        type=lambda s: s.split(","),
+        default=list(SCENARIOS),
+        help=f"Comma separated, any of {', '.join(SCENARIOS)}",
+    )
+    parser.add_argument(
+        "--concurrency",
+        type=lambda s: [int(c) for c in s.split(",")],
+        default=[1, 8, 32],
+    )
+    parser.add_argument("--duration", type=float, default=10, help="Seconds per run")
+    parser.add_argument("--warmup", type=float, default=2, help="Seconds per warm-up")
+    parser.add_argument(
+        "--settle",
+        type=float,
+        default=0,
+        help="Seconds to wait for other workers' metrics before scraping",
+    )
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--sessions", type=int, default=20000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Write the results to this JSON file")
+    parser.add_argument("--compare", help="Baseline JSON file to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.1)
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    results = asyncio.run(run(args))
+
+    report = {
+        "commit": git_commit(),
+        "timestamp": datetime.utcnow().isoformat(),
+        "mode": args.url or "in-process",
+        "python": platform.python_version(),
+        "cpus": os.cpu_count(),
+        "options": {
+            key: value
+            for key, value in vars(args).items()
+            if key not in ("output", "compare")
+        },
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        sys.exit(1 if compare(baseline, results, args.tolerance) else 0)
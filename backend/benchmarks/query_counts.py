@@ -0,0 +1,160 @@
+import argparse
+import os
+import sys
+import uuid
+
+sys.path.append(".")  # Add the current directory to the Python path
+
+# Keep side channels out of the counts
+os.environ.setdefault("SEND_EMAILS", "False")
+os.environ.setdefault("RATE_LIMIT_BACKEND", "memory")
+os.environ.setdefault("RATE_LIMIT", "1000000")
+# The metrics middleware marks statements issued while serving a request
+os.environ["METRICS_ENABLED"] = "True"
+
+from app.database.engine import engine, replica_engine
+from app.hashing import password_hasher
+from app.main import app
+from app.metrics import current_request
+from fastapi.testclient import TestClient
+from sqlalchemy import event
+
+# Most statements each endpoint may issue once caches are warm
+QUERY_BUDGET = {
+    # Probes for the email before hashing, then inserts
+    "POST /api/users/signup": 2,
+    "POST /api/users/signup (taken)": 1,
+    "POST /token": 1,
+    "POST /api/users/login": 2,
+    "GET /api/users/refresh": 1,
+    "GET /api/users/whoami": 0,
+    "PUT /api/users": 1,
+    # Deletes the refresh token and records the revoked access token
+    "POST /api/users/logout": 2,
+}
+
+# A taken email must be rejected before any password is hashed
+HASH_BUDGET = {"POST /api/users/signup (taken)": 0}
+
+statements = []
+hashes = []
+hash_counts = {}
+
+
+# Background loops (purges, activity flushes, revocation syncs) run outside
+# any request and are not counted
+def count_statement(conn, cursor, statement, parameters, context, executemany):
+    if current_request.get() is not None:
+        statements.append(statement)
+
+
+for counted_engine in (engine, replica_engine):
+    if counted_engine is not None:
+        event.listen(
+            counted_engine.sync_engine, "before_cursor_execute", count_statement
+        )
+
+
+def count_hashes(hash_password):
+    async def counted(password: str) -> str:
+        hashes.append(password)
+        return await hash_password(password)
+
+    return counted
+
+
+password_hasher.hash = count_hashes(password_hasher.hash)
+
+
+def measure(
+    client: TestClient, method: str, path: str, expected_status: int = 200, **kwargs
+):
+    del statements[:]
+    del hashes[:]
+    response = client.request(method, path, **kwargs)
+    if response.status_code != expected_status:
+        raise RuntimeError(f"{method} {path} failed: {response.text}")
+    return len(statements), response
+
+
+def run() -> dict:
+    email = f"bench-{uuid.uuid4().hex[:12]}@example.com"
+    headers = {"x-timezone": "UTC", "user-agent": "query-counts"}
+    credentials = {"email": email, "password": "password"}
+    counts = {}
+
+    with TestClient(app) as client:
+        counts["POST /api/users/signup"], _ = measure(
+            client, "POST", "/api/users/signup", json=credentials, headers=headers
+        )
+        counts["POST /api/users/signup (taken)"], _ = measure(
+            client,
+            "POST",
+            "/api/users/signup",
+            expected_status=400,
+            json=credentials,
+            headers=headers,
+        )
+        hash_counts["POST /api/users/signup (taken)"] = len(hashes)
+        counts["POST /token"], _ = measure(
+            client,
+            "POST",
+            "/token",
+            data={"username": email, "password": "password"},
+        )
+        # The first login creates the refresh token, the second replaces it
+        client.post("/api/users/login", json=credentials, headers=headers)
+        counts["POST /api/users/login"], response = measure(
+            client, "POST", "/api/users/login", json=credentials, headers=headers
+        )
+        auth = {
+            **headers,
+            "Authorization": f"Bearer {response.json()['access_token']['token']}",
+        }
+        refresh_token = response.cookies["refreshToken"]
+        client.cookies.clear()
+        counts["GET /api/users/refresh"], _ = measure(
+            client,
+            "GET",
+            "/api/users/refresh",
+            cookies={"refreshToken": refresh_token},
+        )
+        # Warm the user cache first, steady-state reads should not hit the DB
+        client.get("/api/users/whoami", headers=auth)
+        counts["GET /api/users/whoami"], _ = measure(
+            client, "GET", "/api/users/whoami", headers=auth
+        )
+        client.get("/api/users/whoami", headers=auth)
+        counts["PUT /api/users"], _ = measure(
+            client,
+            "PUT",
+            "/api/users",
+            json={"name": "Bench", "timezone": "UTC", "native_language_code": "en"},
+            headers=auth,
+        )
+        client.get("/api/users/whoami", headers=auth)
+        counts["POST /api/users/logout"], _ = measure(
+            client, "POST", "/api/users/logout", headers=auth
+        )
+    return counts
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Count SQL statements per endpoint against DATABASE_URL."
+    )
+    parser.parse_args()
+
+    counts = run()
+    failed = False
+    for endpoint, count in counts.items():
+        budget = QUERY_BUDGET[endpoint]
+        status = "ok" if count <= budget else "OVER BUDGET"
+        failed = failed or count > budget
+        print(f"{endpoint:<32} {count:>3} queries (budget {budget}) {status}")
+    for endpoint, budget in HASH_BUDGET.items():
+        count = hash_counts[endpoint]
+        status = "ok" if count <= budget else "OVER BUDGET"
+        failed = failed or count > budget
+        print(f"{endpoint:<32} {count:>3} hashes  (budget {budget}) {status}")
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,81 @@
+import argparse
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+sys.path.append(".")  # Add the current directory to the Python path
+
+from app.api.sliding_window import SlidingWindowStore
+
+LIMIT = 10
+WINDOW_SECONDS = 3600.0
+
+
+def client_ip(i: int) -> str:
+    return f"10.{i >> 16 & 255}.{i >> 8 & 255}.{i & 255}"
+
+
+class SlidingWindowBench:
+    def __init__(self, keys: int):
+        self.store = SlidingWindowStore(max_keys=keys)
+
+    def hit(self, ip: str) -> bool:
+        return self.store.hit(f"login:{ip}", LIMIT, WINDOW_SECONDS, time.monotonic())
+
+
+# The previous list-of-datetimes limiter, kept here for comparison
+class LegacyBench:
+    def __init__(self, keys: int):
+        self.store = {}
+        self.window = timedelta(seconds=WINDOW_SECONDS)
+
+    def hit(self, ip: str) -> bool:
+        now = datetime.utcnow()
+        times = [t for t in self.store.get(ip, []) if now - t < self.window]
+        if len(times) >= LIMIT:
+            return False
+        times.append(now)
+        self.store[ip] = times
+        return True
+
+
+def run(bench_cls, keys: int, hits_per_key: int, checks: int) -> dict:
+    bench = bench_cls(keys)
+    for _ in range(hits_per_key):
+        for i in range(keys):
+            bench.hit(client_ip(i))
+
+    start = time.perf_counter()
+    for i in range(checks):
+        bench.hit(client_ip(i % keys))
+    check = (time.perf_counter() - start) / checks
+
+    # Memory is measured in a separate pass so tracing does not skew timings
+    tracemalloc.start()
+    bench = bench_cls(keys)
+    for _ in range(hits_per_key):
+        for i in range(keys):
+            bench.hit(client_ip(i))
+    memory, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {"check_ns": check * 1e9, "memory": memory}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the rate limiter.")
+    parser.add_argument("--keys", type=int, default=1_000_000)
+    parser.add_argument("--hits-per-key", type=int, default=LIMIT)
+    parser.add_argument("--checks", type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    print(f"{args.keys} keys, {args.hits_per_key} hits per key, limit {LIMIT}")
+    benches = (("sliding_window", SlidingWindowBench), ("legacy", LegacyBench))
+    for name, bench_cls in benches:
+        result = run(bench_cls, args.keys, args.hits_per_key, args.checks)
+        print(
+            f"{name:>15}: {result['check_ns']:6.0f} ns/check, "
+            f"{result['memory'] / args.keys:5.0f} bytes/key, "
+            f"{result['memory'] / 2**20:6.0f} MiB total"
+        )
@@ -0,0 +1,147 @@
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.append(".")  # Add the current directory to the Python path
+
+import psycopg2
+
+# Refresh token JWTs share this header, the rest is about 140 more characters
+JWT_PREFIX = "eyJhbGciOiJIUzI1NiIsInR5cCI6IkpXVCJ9."
+
+# The table before and after hashing, as temporary tables so nothing persists
+SCHEMAS = {
+    "before": """
+        CREATE TEMP TABLE bench_tokens (
+            id serial PRIMARY KEY,
+            user_id integer NOT NULL,
+            token varchar NOT NULL,
+            device_info varchar,
+            expires_at timestamptz NOT NULL
+        );
+        CREATE INDEX bench_tokens_id ON bench_tokens (id);
+        CREATE UNIQUE INDEX bench_tokens_token ON bench_tokens (token);
+    """,
+    "after": """
+        CREATE TEMP TABLE bench_tokens (
+            id serial PRIMARY KEY,
+            user_id integer NOT NULL,
+            token_hash bytea NOT NULL,
+            device_info varchar,
+            expires_at timestamptz NOT NULL
+        );
+        CREATE UNIQUE INDEX bench_tokens_user_device
+            ON bench_tokens (user_id, device_info) NULLS NOT DISTINCT;
+        CREATE UNIQUE INDEX bench_tokens_user_token
+            ON bench_tokens (user_id, token_hash);
+    """,
+}
+
+TOKEN_SQL = (
+    f"'{JWT_PREFIX}' || md5(i::text) || md5((i + 1)::text) || md5((i + 2)::text)"
+    " || '.' || md5((i + 3)::text)"
+)
+
+FILL = {
+    "before": f"""
+        INSERT INTO bench_tokens (user_id, token, device_info, expires_at)
+        SELECT i / 2, {TOKEN_SQL}, 'agent-' || mod(i, 2), now() + interval '30 days'
+        FROM generate_series(1, %(rows)s) AS i
+    """,
+    "after": f"""
+        INSERT INTO bench_tokens (user_id, token_hash, device_info, expires_at)
+        SELECT i / 2, sha256(convert_to({TOKEN_SQL}, 'UTF8')),
+               'agent-' || mod(i, 2), now() + interval '30 days'
+        FROM generate_series(1, %(rows)s) AS i
+    """,
+}
+
+# The query shapes used by refresh and by login/logout
+LOOKUPS = {
+    "before": {
+        "refresh": "SELECT id FROM bench_tokens WHERE user_id = %s AND token = %s",
+        "device": (
+            "SELECT id FROM bench_tokens WHERE user_id = %s AND device_info = %s"
+        ),
+    },
+    "after": {
+        "refresh": (
+            "SELECT id FROM bench_tokens WHERE user_id = %s "
+            "AND token_hash = sha256(convert_to(%s, 'UTF8'))"
+        ),
+        "device": (
+            "SELECT id FROM bench_tokens WHERE user_id = %s AND device_info = %s"
+        ),
+    },
+}
+
+
+def token_for(cursor, i: int) -> str:
+    cursor.execute(f"SELECT {TOKEN_SQL} FROM (SELECT %s AS i) AS s", (i,))
+    return cursor.fetchone()[0]
+
+
+def time_lookups(cursor, sql: str, params: list) -> float:
+    timings = []
+    for args in params:
+        start = time.perf_counter()
+        cursor.execute(sql, args)
+        cursor.fetchall()
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings)
+
+
+def run(database_url: str, rows: int, lookups: int) -> dict:
+    results = {}
+    samples = random.sample(range(1, rows + 1), lookups)
+    for shape in ("before", "after"):
+        connection = psycopg2.connect(database_url)
+        connection.autocommit = True
+        cursor = connection.cursor()
+        cursor.execute(SCHEMAS[shape])
+        cursor.execute(FILL[shape], {"rows": rows})
+        cursor.execute("ANALYZE bench_tokens")
+
+        cursor.execute(
+            "SELECT indexrelid::regclass::text, pg_relation_size(indexrelid) "
+            "FROM pg_index WHERE indrelid = 'bench_tokens'::regclass"
+        )
+        indexes = dict(cursor.fetchall())
+
+        tokens = [(i // 2, token_for(cursor, i)) for i in samples]
+        devices = [(i // 2, f"agent-{i % 2}") for i in samples]
+        results[shape] = {
+            "indexes": indexes,
+            "refresh": time_lookups(cursor, LOOKUPS[shape]["refresh"], tokens),
+            "device": time_lookups(cursor, LOOKUPS[shape]["device"], devices),
+        }
+        connection.close()
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Compare refresh token index size and lookup latency."
+    )
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--lookups", type=int, default=2000)
+    parser.add_argument(
+        "--database_url",
+        default=os.environ.get("DATABASE_URL", ""),
+        help="Database URL (default: DATABASE_URL)",
+    )
+    args = parser.parse_args()
+
+    database_url = args.database_url.replace("+asyncpg", "")
+    results = run(database_url, args.rows, args.lookups)
+    for shape, result in results.items():
+        print(f"{shape}:")
+        for name, size in sorted(result["indexes"].items()):
+            print(f"  {name:<28} {size / 2**20:8.1f} MiB")
+        total = sum(result["indexes"].values())
+        print(f"  {'total':<28} {total / 2**20:8.1f} MiB")
+        print(f"  refresh lookup (user, token)   {result['refresh'] * 1e6:7.0f} us")
+        print(f"  device lookup (user, device)   {result['device'] * 1e6:7.0f} us")
@@ -0,0 +1,96 @@
+import argparse
+import asyncio
+import sys
+import time
+from datetime import datetime
+
+sys.path.append(".")  # Add the current directory to the Python path
+
+from app.api.models.users import LoginResponse, Token, UserInDB
+from app.api.serializers import login_serializer, token_serializer, user_serializer
+from app.database.schema.users import User
+from fastapi.responses import JSONResponse, ORJSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_model_field
+
+
+def sample_objects():
+    user = User(
+        id=1,
+        email="bench@example.com",
+        name="Bench",
+        password_hash="x" * 60,
+        timezone="Europe/Amsterdam",
+        created_at=datetime.utcnow(),
+        last_login=datetime.utcnow(),
+        last_active=datetime.utcnow().date(),
+        has_access=True,
+    )
+    token = Token(token="e" * 180, expires_days=0.0208)
+    login = LoginResponse(
+        email=user.email,
+        name=user.name,
+        timezone=user.timezone,
+        last_login=user.last_login,
+        access_token=token,
+    )
+    return {
+        "UserInDB (ORM)": (UserInDB, user_serializer, user),
+        "LoginResponse": (LoginResponse, login_serializer, login),
+        "Token": (Token, token_serializer, token),
+    }
+
+
+# What FastAPI does for a response_model: validate, serialize to Python, render
+def fastapi_path(field, response_class, obj) -> bytes:
+    content = asyncio.run(serialize_response(field=field, response_content=obj))
+    return response_class(content).body
+
+
+def fastapi_path_loop(field, response_class, obj, iterations: int) -> float:
+    async def loop():
+        started = time.perf_counter()
+        for _ in range(iterations):
+            content = await serialize_response(field=field, response_content=obj)
+            response_class(content).body
+        return time.perf_counter() - started
+
+    return asyncio.run(loop())
+
+
+def precompiled_loop(serializer, obj, iterations: int) -> float:
+    started = time.perf_counter()
+    for _ in range(iterations):
+        serializer.response(obj).body
+    return time.perf_counter() - started
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Compare FastAPI's response_model path with precompiled serializers."
+    )
+    parser.add_argument("--iterations", type=int, default=50000)
+    args = parser.parse_args()
+
+    for name, (model, serializer, obj) in sample_objects().items():
+        field = create_model_field(name="Response", type_=model, mode="serialization")
+        # Both paths must produce the same document
+        expected = fastapi_path(field, JSONResponse, obj)
+        assert ORJSONResponse(
+            asyncio.run(serialize_response(field=field, response_content=obj))
+        ).body == serializer.to_json(obj), name
+
+        timings = {
+            "JSONResponse": fastapi_path_loop(field, JSONResponse, obj, args.iterations),
+            "ORJSONResponse": fastapi_path_loop(
+                field, ORJSONResponse, obj, args.iterations
+            ),
+            "precompiled": precompiled_loop(serializer, obj, args.iterations),
+        }
+        baseline = timings["JSONResponse"]
+        print(f"{name} ({len(expected)} bytes)")
+        for path, elapsed in timings.items():
+            print(
+                f"  {path:<15} {elapsed / args.iterations * 1e6:7.2f} us/response"
+                f"  {baseline / elapsed:5.2f}x"
+            )
@@ -0,0 +1,50 @@
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+sys.path.append(".")  # Add the current directory to the Python path
+
+# Runs in a fresh interpreter so every sample is a cold worker start
+WORKER = """
+import json, os, sys, time
+sys.path.append(".")
+started = time.perf_counter()
+from app.main import app
+imported = time.perf_counter()
+from fastapi.testclient import TestClient
+with TestClient(app):
+    ready = time.perf_counter()
+    print(json.dumps({"import": imported - started, "ready": ready - started}))
+"""
+
+
+def sample(env: dict) -> dict:
+    output = subprocess.run(
+        [sys.executable, "-c", WORKER],
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure worker import and ready time.")
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    modes = {
+        "cold": {"STARTUP_WARMUP": "False"},
+        "warm": {"STARTUP_WARMUP": "True"},
+        "create_tables": {"STARTUP_WARMUP": "False", "DB_CREATE_TABLES": "True"},
+    }
+    for name, overrides in modes.items():
+        env = {**os.environ, "SEND_EMAILS": "False", **overrides}
+        samples = [sample(env) for _ in range(args.runs)]
+        imported = statistics.median(s["import"] for s in samples)
+        ready = statistics.median(s["ready"] for s in samples)
+        print(f"{name:>13}: import {imported:6.3f}s, ready {ready:6.3f}s")
@@ -0,0 +1,160 @@
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+sys.path.append(".")  # Add the current directory to the Python path
+
+import psycopg2
+
+# The users table with the indexes from de8952e06f87, as a temporary table
+# so nothing persists
+SCHEMA = """
+    CREATE TEMP TABLE bench_users (
+        id serial PRIMARY KEY,
+        email text NOT NULL UNIQUE,
+        created_at timestamp NOT NULL,
+        last_active date NOT NULL,
+        has_access boolean NOT NULL
+    );
+"""
+INDEXES = """
+    CREATE INDEX bench_users_created_at_id ON bench_users (created_at, id);
+    CREATE INDEX bench_users_has_access_created_at_id
+        ON bench_users (has_access, created_at, id);
+    CREATE INDEX bench_users_last_active ON bench_users (last_active);
+    CREATE INDEX bench_users_email_pattern ON bench_users (email text_pattern_ops);
+"""
+# A sign-up every 30 seconds, half of them with access
+FILL = """
+    INSERT INTO bench_users (email, created_at, last_active, has_access)
+    SELECT 'u' || md5(i::text) || '@example.com',
+           timestamp '2020-01-01' + i * interval '30 seconds',
+           date '2020-01-01' + mod(i, 1500),
+           mod(i, 2) = 0
+    FROM generate_series(1, %(rows)s) AS i
+"""
+
+ORDER = "ORDER BY created_at DESC, id DESC LIMIT %(limit)s"
+# Query shapes of app.core.admin.list_users
+FILTERS = {
+    "all": "TRUE",
+    "has_access": "has_access",
+}
+# Selective filters, planned on their own index and then sorted
+PREFIX_FILTERS = {
+    "email_prefix": "email ~>=~ 'uabc' AND email ~<~ 'uabd'",
+    "last_active": (
+        "last_active >= date '2022-01-01' AND last_active < date '2022-01-02'"
+    ),
+}
+
+
+def time_query(cursor, sql: str, params: dict, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        cursor.execute(sql, params)
+        cursor.fetchall()
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings)
+
+
+def scans(cursor, sql: str, params: dict) -> list[str]:
+    cursor.execute("EXPLAIN (FORMAT JSON) " + sql, params)
+    found, pending = [], [cursor.fetchone()[0][0]["Plan"]]
+    while pending:
+        node = pending.pop()
+        if "Scan" in node["Node Type"]:
+            found.append(f"{node['Node Type']} {node.get('Index Name', '')}".strip())
+        pending.extend(node.get("Plans", []))
+    return found
+
+
+def run(database_url: str, rows: int, limit: int, pages: list, repeat: int) -> dict:
+    connection = psycopg2.connect(database_url)
+    connection.autocommit = True
+    cursor = connection.cursor()
+    cursor.execute(SCHEMA)
+    cursor.execute(FILL, {"rows": rows})
+    cursor.execute(INDEXES)
+    cursor.execute("ANALYZE bench_users")
+
+    results = {}
+    for name, where in FILTERS.items():
+        results[name] = {}
+        for page in pages:
+            params = {"limit": limit, "offset": (page - 1) * limit}
+            offset_sql = (
+                f"SELECT * FROM bench_users WHERE {where} {ORDER} OFFSET %(offset)s"
+            )
+            keyset_sql = f"SELECT * FROM bench_users WHERE {where} {ORDER}"
+            if page > 1:
+                # The cursor the previous page would have returned
+                cursor.execute(
+                    f"SELECT created_at, id FROM bench_users WHERE {where} "
+                    "ORDER BY created_at DESC, id DESC LIMIT 1 OFFSET %(last)s",
+                    {"last": params["offset"] - 1},
+                )
+                position = cursor.fetchone()
+                if position is None:
+                    continue
+                params["created_at"], params["id"] = position
+                keyset_sql = (
+                    f"SELECT * FROM bench_users WHERE {where} "
+                    "AND (created_at, id) < (%(created_at)s, %(id)s) " + ORDER
+                )
+            results[name][page] = {
+                "offset": time_query(cursor, offset_sql, params, repeat),
+                "keyset": time_query(cursor, keyset_sql, params, repeat),
+                "keyset_scans": scans(cursor, keyset_sql, params),
+            }
+
+    plans = {}
+    for name, where in PREFIX_FILTERS.items():
+        sql = f"SELECT * FROM bench_users WHERE {where} {ORDER}"
+        plans[name] = {
+            "first_page": time_query(cursor, sql, {"limit": limit}, repeat),
+            "scans": scans(cursor, sql, {"limit": limit}),
+        }
+    connection.close()
+    return {"pages": results, "filters": plans}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Compare OFFSET and keyset pagination of the admin user listing."
+    )
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--limit", type=int, default=50)
+    parser.add_argument("--pages", type=int, nargs="+", default=[1, 100, 10_000])
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--json", action="store_true", help="Print raw results")
+    parser.add_argument(
+        "--database_url",
+        default=os.environ.get("DATABASE_URL", ""),
+        help="Database URL (default: DATABASE_URL)",
+    )
+    args = parser.parse_args()
+
+    database_url = args.database_url.replace("+asyncpg", "")
+    results = run(database_url, args.rows, args.limit, args.pages, args.repeat)
+    if args.json:
+        print(json.dumps(results, indent=2))
+        sys.exit()
+
+    for name, pages in results["pages"].items():
+        print(f"{name}:")
+        for page, result in pages.items():
+            print(
+                f"  page {page:>6}  offset {result['offset'] * 1e3:8.2f} ms"
+                f"  keyset {result['keyset'] * 1e3:6.2f} ms"
+                f"  ({', '.join(result['keyset_scans'])})"
+            )
+    for name, result in results["filters"].items():
+        print(
+            f"{name}: first page {result['first_page'] * 1e3:.2f} ms"
+            f"  ({', '.join(result['scans'])})"
+        )
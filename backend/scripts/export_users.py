@@ -0,0 +1,92 @@
+import argparse
+import sys
+from datetime import date, datetime
+
+from sqlalchemy import create_engine
+
+sys.path.append(".")  # Add the current directory to the Python path
+
+from app.core.export import (
+    EXPORT_COLUMNS,
+    EXPORT_FORMATS,
+    build_export_query,
+    encode_chunk,
+    encode_header,
+    parse_columns,
+)
+
+
+def _parse_bool(value: str) -> bool:
+    return value.strip().lower() in ("1", "true", "yes")
+
+
+def export_users(
+    database_url: str,
+    output,
+    format: str,
+    columns: tuple[str, ...],
+    batch_size: int,
+    **filters,
+):
+    engine = create_engine(database_url.replace("+asyncpg", ""))
+    query = build_export_query(columns, **filters)
+    output.write(encode_header(format, columns))
+    exported = 0
+    try:
+        # stream_results uses a named (server-side) cursor with psycopg2
+        with engine.connect() as connection:
+            result = connection.execution_options(
+                stream_results=True, yield_per=batch_size
+            ).execute(query)
+            for rows in result.partitions():
+                output.write(encode_chunk(format, columns, rows))
+                exported += len(rows)
+    finally:
+        engine.dispose()
+    print(f"Exported {exported} users", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Export users as NDJSON or CSV without loading the table into memory."
+    )
+    parser.add_argument("--database_url", required=True, help="Database URL")
+    parser.add_argument(
+        "--output", help="File to write to (default: standard output)"
+    )
+    parser.add_argument("--format", choices=EXPORT_FORMATS, default="ndjson")
+    parser.add_argument(
+        "--columns",
+        help=f"Comma separated, any of {', '.join(EXPORT_COLUMNS)} (default: all)",
+    )
+    parser.add_argument("--batch_size", type=int, default=1000)
+    parser.add_argument("--has_access", type=_parse_bool)
+    parser.add_argument("--created_after", type=datetime.fromisoformat)
+    parser.add_argument("--created_before", type=datetime.fromisoformat)
+    parser.add_argument("--active_after", type=date.fromisoformat)
+    parser.add_argument("--active_before", type=date.fromisoformat)
+
+    args = parser.parse_args()
+
+    try:
+        columns = parse_columns(args.columns)
+    except ValueError as e:
+        parser.error(str(e))
+
+    output = open(args.output, "wb") if args.output else sys.stdout.buffer
+    try:
+        export_users(
+            args.database_url,
+            output,
+            args.format,
+            columns,
+            args.batch_size,
+            has_access=args.has_access,
+            created_after=args.created_after,
+            created_before=args.created_before,
+            active_after=args.active_after,
+            active_before=args.active_before,
+        )
+    finally:
+        if args.output:
+            output.close()
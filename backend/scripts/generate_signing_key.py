@@ -0,0 +1,76 @@
+import argparse
+import os
+from datetime import datetime
+
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import ec, rsa
+
+CURVES = {"ES256": ec.SECP256R1, "ES384": ec.SECP384R1, "ES512": ec.SECP521R1}
+
+
+def generate_signing_key(algorithm: str, keys_dir: str, kid: str) -> str:
+    if algorithm.startswith("RS"):
+        private_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    elif algorithm in CURVES:
+        private_key = ec.generate_private_key(CURVES[algorithm]())
+    else:
+        raise ValueError(f"Unsupported algorithm: {algorithm}")
+
+    os.makedirs(keys_dir, exist_ok=True)
+    path = os.path.join(keys_dir, f"{kid}.pem")
+    # Written under a temporary name and renamed, so a running app never
+    # loads a half-written key
+    temporary_path = os.path.join(keys_dir, f".{kid}.tmp")
+    fd = os.open(temporary_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    with open(fd, "wb") as f:
+        f.write(
+            private_key.private_bytes(
+                serialization.Encoding.PEM,
+                serialization.PrivateFormat.PKCS8,
+                serialization.NoEncryption(),
+            )
+        )
+    os.rename(temporary_path, path)
+    return path
+
+
+def retire_signing_key(keys_dir: str, kid: str) -> str:
+    # Keep only the public half so existing tokens still verify
+    path = os.path.join(keys_dir, f"{kid}.pem")
+    with open(path, "rb") as f:
+        private_key = serialization.load_pem_private_key(f.read(), password=None)
+    public_path = os.path.join(keys_dir, f"{kid}.pub.pem")
+    with open(public_path, "wb") as f:
+        f.write(
+            private_key.public_key().public_bytes(
+                serialization.Encoding.PEM,
+                serialization.PublicFormat.SubjectPublicKeyInfo,
+            )
+        )
+    os.remove(path)
+    return public_path
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Create or retire a JWT signing key in JWT_KEYS_DIR."
+    )
+    parser.add_argument("--algorithm", default="RS256", help="RS256 or ES256/384/512")
+    parser.add_argument("--keys_dir", default=os.environ.get("JWT_KEYS_DIR", "keys"))
+    parser.add_argument(
+        "--kid",
+        default=datetime.utcnow().strftime("%Y%m%d%H%M%S"),
+        help="Key ID (default: current UTC timestamp)",
+    )
+    parser.add_argument(
+        "--retire",
+        action="store_true",
+        help="Replace the private key with its public key so it only verifies",
+    )
+
+    args = parser.parse_args()
+
+    if args.retire:
+        print(f"Retired {retire_signing_key(args.keys_dir, args.kid)}")
+    else:
+        print(f"Created {generate_signing_key(args.algorithm, args.keys_dir, args.kid)}")
@@ -0,0 +1,265 @@
+import argparse
+import csv
+import io
+import itertools
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterator
+
+import psycopg2
+from passlib.context import CryptContext
+
+# Set up password hashing (same as in auth.py)
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+
+STAGING_COLUMNS = ("email", "name", "password_hash", "timezone", "has_access")
+
+
+# Module level so it can be pickled into the process pool
+def hash_password(password: str) -> str:
+    return pwd_context.hash(password)
+
+
+def read_rows(path: str) -> Iterator[dict]:
+    with open(path, newline="") as f:
+        if path.endswith((".jsonl", ".ndjson")):
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+        else:
+            yield from csv.DictReader(f)
+
+
+def batches(rows: Iterator[dict], size: int) -> Iterator[list[dict]]:
+    while True:
+        batch = list(itertools.islice(rows, size))
+        if not batch:
+            return
+        yield batch
+
+
+# Anything login cannot verify would fail with a 500 instead of a 401, and
+# identify() only looks at the prefix
+def _valid_hash(password_hash: str) -> bool:
+    if pwd_context.identify(password_hash) != "bcrypt":
+        return False
+    try:
+        pwd_context.handler("bcrypt").from_string(password_hash)
+    except ValueError:
+        return False
+    return True
+
+
+def _parse_bool(value) -> bool:
+    if isinstance(value, bool):
+        return value
+    return str(value or "").strip().lower() in ("1", "true", "yes")
+
+
+# Normalizes a batch the way the API does, dropping rows that cannot be
+# imported and emails repeated within the input
+def prepare(batch: list[dict], default_timezone: str, seen: set) -> tuple[list, int]:
+    users, invalid = [], 0
+    for row in batch:
+        email = (row.get("email") or "").lower().strip()
+        password = (row.get("password") or "").strip()
+        password_hash = (row.get("password_hash") or "").strip()
+        if (
+            "@" not in email
+            or not (password or password_hash)
+            or (password_hash and not _valid_hash(password_hash))
+            or email in seen
+        ):
+            invalid += 1
+            continue
+        seen.add(email)
+        users.append(
+            {
+                "email": email,
+                "name": (row.get("name") or "").strip(),
+                "password": password,
+                "password_hash": password_hash,
+                "timezone": (row.get("timezone") or "").strip() or default_timezone,
+                "has_access": _parse_bool(row.get("has_access")),
+            }
+        )
+    return users, invalid
+
+
+def existing_emails(cursor, emails: list[str]) -> set:
+    cursor.execute("SELECT email FROM users WHERE email = ANY(%s)", (emails,))
+    return {email for (email,) in cursor.fetchall()}
+
+
+def copy_users(cursor, users: list[dict]) -> int:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for user in users:
+        writer.writerow([user[column] for column in STAGING_COLUMNS])
+    buffer.seek(0)
+
+    cursor.execute(
+        "CREATE TEMP TABLE import_users "
+        "(email text, name text, password_hash text, timezone text, has_access bool) "
+        "ON COMMIT DROP"
+    )
+    cursor.copy_expert(
+        # No column is nullable, empty CSV fields are empty strings
+        f"COPY import_users ({', '.join(STAGING_COLUMNS)}) "
+        "FROM STDIN WITH (FORMAT csv, NULL '\\N')",
+        buffer,
+    )
+    # Emails registered since the dedup query are skipped here instead of
+    # failing the batch
+    cursor.execute(
+        "INSERT INTO users "
+        "(email, name, password_hash, timezone, has_access, "
+        "created_at, last_login, last_active) "
+        "SELECT email, name, password_hash, timezone, has_access, "
+        "now() AT TIME ZONE 'utc', now() AT TIME ZONE 'utc', current_date "
+        "FROM import_users "
+        "ON CONFLICT (email) DO NOTHING"
+    )
+    return cursor.rowcount
+
+
+def load_state(path: str, input_path: str) -> dict:
+    try:
+        with open(path) as f:
+            state = json.load(f)
+    except FileNotFoundError:
+        return {}
+    if state.get("input") != os.path.abspath(input_path):
+        raise SystemExit(f"{path} belongs to {state.get('input')}, not {input_path}")
+    return state
+
+
+def save_state(path: str, state: dict):
+    # Written then renamed so a crash never leaves a truncated checkpoint
+    with open(f"{path}.tmp", "w") as f:
+        json.dump(state, f)
+    os.replace(f"{path}.tmp", path)
+
+
+def import_users(
+    input_path: str,
+    database_url: str,
+    batch_size: int,
+    workers: int,
+    default_timezone: str,
+    state_path: str,
+    resume: bool,
+):
+    state = load_state(state_path, input_path) if resume else {}
+    done = state.get("rows", 0)
+    totals = {
+        key: state.get(key, 0) for key in ("inserted", "existing", "invalid")
+    }
+
+    connection = psycopg2.connect(database_url.replace("+asyncpg", ""))
+    rows = read_rows(input_path)
+    # Rows committed by a previous run
+    for _ in itertools.islice(rows, done):
+        pass
+    if done:
+        print(f"Resuming after {done} rows")
+
+    seen: set = set()
+    started = time.perf_counter()
+    imported_this_run = 0
+    try:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            for batch in batches(rows, batch_size):
+                users, invalid = prepare(batch, default_timezone, seen)
+                existing = set()
+                if users:
+                    with connection, connection.cursor() as cursor:
+                        existing = existing_emails(
+                            cursor, [user["email"] for user in users]
+                        )
+                users = [user for user in users if user["email"] not in existing]
+
+                # Only hash what will be inserted, rows with a hash keep it.
+                # Done outside the transaction so it is not held open.
+                to_hash = [user for user in users if not user["password_hash"]]
+                hashes = pool.map(
+                    hash_password,
+                    [user["password"] for user in to_hash],
+                    chunksize=max(1, len(to_hash) // (workers * 4)),
+                )
+                for user, password_hash in zip(to_hash, hashes):
+                    user["password_hash"] = password_hash
+
+                inserted = 0
+                if users:
+                    with connection, connection.cursor() as cursor:
+                        inserted = copy_users(cursor, users)
+                # Committed, record progress
+                done += len(batch)
+                imported_this_run += len(batch)
+                totals["inserted"] += inserted
+                totals["existing"] += len(existing) + len(users) - inserted
+                totals["invalid"] += invalid
+                save_state(
+                    state_path,
+                    {"input": os.path.abspath(input_path), "rows": done, **totals},
+                )
+
+                elapsed = time.perf_counter() - started
+                print(
+                    f"{done} rows: {totals['inserted']} inserted, "
+                    f"{totals['existing']} already registered, "
+                    f"{totals['invalid']} invalid or duplicate "
+                    f"({imported_this_run / elapsed:.0f} rows/s)"
+                )
+    finally:
+        connection.close()
+
+    print(f"Imported {input_path} in {time.perf_counter() - started:.1f}s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Import users from a CSV or JSONL file into the database."
+    )
+    parser.add_argument(
+        "input",
+        help="CSV with a header row, or .jsonl; fields email, password or "
+        "password_hash (bcrypt), and optionally name, timezone, has_access",
+    )
+    parser.add_argument("--database_url", required=True, help="Database URL")
+    parser.add_argument("--batch_size", type=int, default=2000)
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=os.cpu_count() or 1,
+        help="Password hashing processes (default: all cores)",
+    )
+    parser.add_argument(
+        "--timezone",
+        default="America/New_York",
+        help="Timezone for rows without one (default: America/New_York)",
+    )
+    parser.add_argument(
+        "--state",
+        help="Checkpoint file (default: <input>.import-state)",
+    )
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="Skip the rows a previous run already committed",
+    )
+
+    args = parser.parse_args()
+
+    import_users(
+        args.input,
+        args.database_url,
+        args.batch_size,
+        args.workers,
+        args.timezone,
+        args.state or f"{args.input}.import-state",
+        args.resume,
+    )
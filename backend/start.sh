@@ -4,5 +4,11 @@ set -e
 # Run migrations
 alembic upgrade head
 
+# Worker metrics snapshots from the previous run
+rm -rf "${METRICS_DIR:-/tmp/saas-launchpad-metrics}"
+
+# The app splits DB_MAX_CONNECTIONS between this many workers
+export WEB_CONCURRENCY=${WEB_CONCURRENCY:-2}
+
 # Start the FastAPI application
-uv run uvicorn app.main:app --host 0.0.0.0 --port 8000 --workers 2
+uv run uvicorn app.main:app --host 0.0.0.0 --port 8000 --workers $WEB_CONCURRENCY
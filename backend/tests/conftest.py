@@ -0,0 +1,19 @@
+import os
+
+import pytest
+
+# app.config refuses to import without a DATABASE_URL. Tests that need a real
+# database use the database fixture, which skips unless one was configured.
+DATABASE_CONFIGURED = "DATABASE_URL" in os.environ
+os.environ.setdefault("DATABASE_URL", "postgresql+asyncpg://localhost/test")
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+@pytest.fixture
+def database():
+    if not DATABASE_CONFIGURED:
+        pytest.skip("DATABASE_URL is not set")
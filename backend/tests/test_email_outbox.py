@@ -0,0 +1,260 @@
+import asyncio
+import socket
+import uuid
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from aiosmtpd.controller import Controller
+from app import config
+from app.database.engine import AsyncSessionLocal, engine
+from app.database.schema.emails import OutboxEmail
+from app.email import EmailOutbox
+from sqlalchemy import delete, func, select, update
+
+pytestmark = pytest.mark.anyio
+
+DOMAIN = "outbox-test.invalid"
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+# Accepts everything except recipients starting with "fail", which get a
+# temporary error. Can hang up after every message, or once without a word
+# when the next message starts, like a connection that went stale.
+class RecordingHandler:
+    def __init__(self):
+        self.received: list[tuple[tuple, list[str]]] = []
+        self.drop_after_message = False
+        self.hang_up_on_next_mail = False
+
+    async def handle_MAIL(self, server, session, envelope, address, mail_options):
+        if self.hang_up_on_next_mail:
+            self.hang_up_on_next_mail = False
+            server.transport.abort()
+            return "421 Closing"
+        envelope.mail_from = address
+        envelope.mail_options.extend(mail_options)
+        return "250 OK"
+
+    async def handle_RCPT(self, server, session, envelope, address, rcpt_options):
+        if address.startswith("fail"):
+            return "451 4.3.0 Try again later"
+        envelope.rcpt_tos.append(address)
+        return "250 OK"
+
+    async def handle_DATA(self, server, session, envelope):
+        self.received.append((session.peer, envelope.rcpt_tos))
+        if self.drop_after_message:
+            asyncio.get_running_loop().call_later(0.05, server.transport.close)
+        return "250 OK"
+
+    def recipients(self) -> list[str]:
+        return [rcpt for _, rcpts in self.received for rcpt in rcpts]
+
+
+@pytest.fixture
+def smtp_server(monkeypatch):
+    handler = RecordingHandler()
+    controller = Controller(handler, hostname="127.0.0.1", port=free_port())
+    controller.start()
+    monkeypatch.setattr(config, "EMAIL_SMTP_HOST", "127.0.0.1")
+    monkeypatch.setattr(config, "EMAIL_SMTP_PORT", controller.port)
+    monkeypatch.setattr(config, "EMAIL_SMTP_USE_TLS", False)
+    monkeypatch.setattr(config, "EMAIL_LOGIN", None)
+    monkeypatch.setattr(config, "EMAIL_SENDER", f"noreply@{DOMAIN}")
+    yield handler
+    controller.stop()
+
+
+# Every sender claims whatever is due, so refuse to run against a database
+# that holds real pending emails
+@pytest.fixture
+async def outbox_table(database):
+    async with AsyncSessionLocal() as session:
+        pending = await session.scalar(
+            select(func.count())
+            .select_from(OutboxEmail)
+            .where(
+                OutboxEmail.sent_at.is_(None),
+                OutboxEmail.failed_at.is_(None),
+                ~OutboxEmail.recipient.endswith(f"@{DOMAIN}"),
+            )
+        )
+    if pending:
+        await engine.dispose()
+        pytest.skip("email_outbox has pending emails, use a test database")
+    yield
+    async with AsyncSessionLocal() as session, session.begin():
+        await session.execute(
+            delete(OutboxEmail).where(OutboxEmail.recipient.endswith(f"@{DOMAIN}"))
+        )
+    # Pooled connections belong to this test's event loop
+    await engine.dispose()
+
+
+def make_outbox(**kwargs) -> EmailOutbox:
+    options = dict(batch_size=10, poll_interval=60, max_attempts=3, retry_delay=30)
+    return EmailOutbox(**{**options, **kwargs})
+
+
+def address(prefix: str = "user") -> str:
+    return f"{prefix}-{uuid.uuid4().hex[:8]}@{DOMAIN}"
+
+
+async def add_emails(*recipients: str) -> list[int]:
+    async with AsyncSessionLocal() as session, session.begin():
+        emails = [
+            OutboxEmail(recipient=recipient, subject="Hi", text_body="Hello")
+            for recipient in recipients
+        ]
+        session.add_all(emails)
+    return [email.id for email in emails]
+
+
+async def load(email_id: int) -> OutboxEmail:
+    async with AsyncSessionLocal() as session:
+        return await session.get(OutboxEmail, email_id)
+
+
+async def wait_for_delivery(handler: RecordingHandler, recipient: str, timeout=5):
+    async with asyncio.timeout(timeout):
+        while recipient not in handler.recipients():
+            await asyncio.sleep(0.05)
+
+
+async def test_sender_wakes_up_on_commit(smtp_server, outbox_table):
+    outbox = make_outbox(poll_interval=60)
+    outbox.start()
+    try:
+        # Let the first, empty batch finish so the sender is asleep
+        await asyncio.sleep(0.3)
+        recipient = address()
+        async with AsyncSessionLocal() as db:
+            await outbox.enqueue(db, recipient, "Hi", "Hello", "<p>Hello</p>")
+            await db.flush()
+            await asyncio.sleep(0.3)
+            assert recipient not in smtp_server.recipients()
+            await db.commit()
+
+        # Far sooner than the 60 second poll interval
+        await wait_for_delivery(smtp_server, recipient, timeout=5)
+    finally:
+        await outbox.stop()
+
+
+async def test_claim_skips_rows_locked_by_another_sender(smtp_server, outbox_table):
+    ids = await add_emails(*(address() for _ in range(4)))
+    locked, free = ids[:2], ids[2:]
+
+    async with AsyncSessionLocal() as other, other.begin():
+        # What a second sender holds while its claim is in flight
+        await other.execute(
+            select(OutboxEmail.id)
+            .where(OutboxEmail.id.in_(locked))
+            .with_for_update()
+        )
+        claimed = await asyncio.wait_for(make_outbox()._claim(), timeout=5)
+        assert sorted(email.id for email in claimed) == free
+
+    # Claimed rows are leased, only the ones that were locked are left
+    claimed = await make_outbox()._claim()
+    assert sorted(email.id for email in claimed) == locked
+
+
+async def test_concurrent_senders_deliver_each_email_once(smtp_server, outbox_table):
+    recipients = [address() for _ in range(20)]
+    await add_emails(*recipients)
+
+    first, second = make_outbox(batch_size=5), make_outbox(batch_size=5)
+    try:
+        while True:
+            claimed = await asyncio.gather(first.send_batch(), second.send_batch())
+            if not any(claimed):
+                break
+    finally:
+        await first.stop()
+        await second.stop()
+
+    delivered = [rcpt for rcpt in smtp_server.recipients() if rcpt in recipients]
+    assert sorted(delivered) == sorted(recipients)
+
+
+async def test_failed_send_is_retried_with_backoff(smtp_server, outbox_table):
+    (email_id,) = await add_emails(address("fail"))
+    outbox = make_outbox(max_attempts=2, retry_delay=30)
+    try:
+        await outbox.send_batch()
+        email = await load(email_id)
+        delay = email.next_attempt_at - datetime.now(timezone.utc)
+        assert email.attempts == 1
+        assert "451" in email.last_error
+        assert timedelta(seconds=25) < delay <= timedelta(seconds=30)
+        assert email.sent_at is None and email.failed_at is None
+
+        # Not due yet, nothing is claimed
+        assert await outbox.send_batch() == 0
+
+        async with AsyncSessionLocal() as session, session.begin():
+            await session.execute(
+                update(OutboxEmail)
+                .where(OutboxEmail.id == email_id)
+                .values(next_attempt_at=func.now())
+            )
+        await outbox.send_batch()
+        email = await load(email_id)
+        delay = email.next_attempt_at - datetime.now(timezone.utc)
+        assert email.attempts == 2
+        # The delay doubles on every attempt
+        assert timedelta(seconds=55) < delay <= timedelta(seconds=60)
+        # max_attempts reached, the email is given up on
+        assert email.failed_at is not None and email.sent_at is None
+    finally:
+        await outbox.stop()
+
+
+async def test_reconnects_after_server_hangs_up(smtp_server, outbox_table):
+    smtp_server.drop_after_message = True
+    outbox = make_outbox()
+    try:
+        first, second = address(), address()
+        (first_id,) = await add_emails(first)
+        await outbox.send_batch()
+        assert first in smtp_server.recipients()
+
+        # The server hangs up on the pooled connection
+        await asyncio.sleep(0.3)
+        (second_id,) = await add_emails(second)
+        await outbox.send_batch()
+        assert second in smtp_server.recipients()
+
+        peers = {peer for peer, _ in smtp_server.received}
+        assert len(peers) == 2
+        assert (await load(first_id)).sent_at is not None
+        assert (await load(second_id)).sent_at is not None
+    finally:
+        await outbox.stop()
+
+
+async def test_reconnects_when_pooled_connection_is_stale(smtp_server, outbox_table):
+    outbox = make_outbox()
+    try:
+        first, second = address(), address()
+        await add_emails(first)
+        await outbox.send_batch()
+        pooled = outbox._smtp
+
+        # Still looks connected, the failure only shows on the next command
+        smtp_server.hang_up_on_next_mail = True
+        (second_id,) = await add_emails(second)
+        await outbox.send_batch()
+
+        assert second in smtp_server.recipients()
+        assert outbox._smtp is not pooled
+        email = await load(second_id)
+        assert email.sent_at is not None and email.attempts == 0
+    finally:
+        await outbox.stop()
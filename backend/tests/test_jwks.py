@@ -0,0 +1,171 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+
+import pytest
+from app import jwks
+from app.exceptions import UnauthorizedException
+from app.http_client import http_client
+from app.jwks import JWKSCache
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+from jose import jwk, jwt
+
+pytestmark = pytest.mark.anyio
+
+
+def make_key(kid: str) -> tuple[str, dict]:
+    private_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    pem = private_key.private_bytes(
+        serialization.Encoding.PEM,
+        serialization.PrivateFormat.PKCS8,
+        serialization.NoEncryption(),
+    ).decode()
+    public = jwk.construct(pem, "RS256").public_key().to_dict()
+    return pem, {**public, "kid": kid, "alg": "RS256", "use": "sig"}
+
+
+# Serves whatever keys and Cache-Control the test sets, counting fetches
+class KeyServer(ThreadingHTTPServer):
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), KeyHandler)
+        self.keys: list[dict] = []
+        self.cache_control = "public, max-age=3600"
+        self.fetches = 0
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}/certs"
+
+
+class KeyHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        self.server.fetches += 1
+        body = json.dumps({"keys": self.server.keys}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Cache-Control", self.server.cache_control)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def key_server():
+    server = KeyServer()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+async def client():
+    yield
+    # The pooled client is bound to the event loop of the test
+    await http_client.close()
+
+
+# Replaces the monotonic clock of app.jwks only, asyncio keeps the real one
+@pytest.fixture
+def clock(monkeypatch):
+    now = SimpleNamespace(value=1000.0)
+    monkeypatch.setattr(jwks, "time", SimpleNamespace(monotonic=lambda: now.value))
+    return now
+
+
+async def test_verifies_token_signed_with_served_key(key_server, client, clock):
+    pem, public = make_key("first")
+    key_server.keys = [public]
+    cache = JWKSCache(key_server.url, algorithm="RS256")
+
+    token = jwt.encode({"sub": "a"}, pem, algorithm="RS256", headers={"kid": "first"})
+    key = await cache.get_key(jwt.get_unverified_header(token)["kid"])
+
+    assert jwt.decode(token, key, algorithms=["RS256"]) == {"sub": "a"}
+    assert key_server.fetches == 1
+
+
+async def test_rotation_picks_up_new_kid(key_server, client, clock):
+    _, first = make_key("first")
+    key_server.keys = [first]
+    cache = JWKSCache(key_server.url, algorithm="RS256", min_refresh_interval=60)
+    await cache.get_key("first")
+
+    _, second = make_key("second")
+    key_server.keys = [second]
+    clock.value += 60
+
+    assert (await cache.get_key("second")).to_dict()["n"] == second["n"]
+    assert key_server.fetches == 2
+    # The retired key is gone once the new set is fetched
+    with pytest.raises(UnauthorizedException):
+        await cache.get_key("first")
+
+
+async def test_unknown_kid_refetches_at_most_once_per_interval(
+    key_server, client, clock
+):
+    _, first = make_key("first")
+    key_server.keys = [first]
+    cache = JWKSCache(key_server.url, algorithm="RS256", min_refresh_interval=60)
+    await cache.get_key("first")
+
+    for _ in range(5):
+        clock.value += 10
+        with pytest.raises(UnauthorizedException):
+            await cache.get_key("forged")
+    assert key_server.fetches == 1
+
+    clock.value += 10
+    with pytest.raises(UnauthorizedException):
+        await cache.get_key("forged")
+    assert key_server.fetches == 2
+
+
+async def test_honors_max_age(key_server, client, clock):
+    _, first = make_key("first")
+    key_server.keys = [first]
+    key_server.cache_control = "public, max-age=300, must-revalidate"
+    cache = JWKSCache(key_server.url, algorithm="RS256", default_max_age=3600)
+    await cache.get_key("first")
+
+    clock.value += 299
+    await cache.get_key("first")
+    assert key_server.fetches == 1
+
+    clock.value += 1
+    await cache.get_key("first")
+    assert key_server.fetches == 2
+
+
+async def test_default_max_age_without_cache_control(key_server, client, clock):
+    _, first = make_key("first")
+    key_server.keys = [first]
+    key_server.cache_control = "no-transform"
+    cache = JWKSCache(key_server.url, algorithm="RS256", default_max_age=120)
+    await cache.get_key("first")
+
+    clock.value += 119
+    await cache.get_key("first")
+    assert key_server.fetches == 1
+
+    clock.value += 1
+    await cache.get_key("first")
+    assert key_server.fetches == 2
+
+
+@pytest.mark.parametrize("kid", [None, ["first"], {"kid": "first"}, 1])
+async def test_rejects_kid_that_is_not_a_string(key_server, client, clock, kid):
+    _, first = make_key("first")
+    key_server.keys = [first]
+    cache = JWKSCache(key_server.url, algorithm="RS256")
+
+    with pytest.raises(UnauthorizedException):
+        await cache.get_key(kid)
+    assert key_server.fetches == 0